@@ -0,0 +1,54 @@
+""" Time calling composed functions, looping and compiled.
+
+Composed extractors are called for every element selected from every
+page so the cost of calling them (rather than of the functions they
+are composed of) matters.  Run with::
+
+    $ python benchmarks/bench_composed.py
+
+"called" is calling the composed function itself, which compiles it
+when first called and then calls the compiled function.
+"""
+
+from __future__ import print_function, unicode_literals
+import timeit
+from wex.composed import composable
+from wex.etree import map_if_list
+from wex.iterable import map_if_iter
+
+NUMBER = 200000
+
+
+@composable
+def strip(s):
+    return s.strip()
+
+
+def upper(s):
+    return s.upper()
+
+
+def length(s):
+    return len(s)
+
+
+CASES = (
+    ('2 functions', strip | upper, ' a '),
+    ('4 functions', strip | upper | strip | length, ' a '),
+    ('map_if_list', map_if_list(upper) | map_if_list(length), ['a', 'b']),
+    ('map_if_iter', map_if_iter(upper) | map_if_iter(length), 'a'),
+)
+
+
+def main():
+    for label, func, arg in CASES:
+        times = []
+        for call in (func.call, func, func.compile()):
+            times.append(min(timeit.repeat(lambda: call(arg),
+                                           number=NUMBER, repeat=3)))
+        print('%s: looping %.3fs, called %.3fs, compiled %.3fs' %
+              ((label,) + tuple(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+""" Time flattening extractor output.
+
+Every value yielded by an extractor (and every label and value
+written) is flattened, so flattening should cost little more than
+iterating.  This compares :func:`wex.iterable.flatten` with chaining
+the generators from :func:`wex.iterable.walk` (how it used to be
+done).  Run with::
+
+    $ python benchmarks/bench_flatten.py
+"""
+
+from __future__ import print_function, unicode_literals
+import timeit
+from itertools import chain
+from wex.iterable import walk, flatten, should_iter
+from wex.value import should_iter_unless_list, yield_values
+
+NUMBER = 20
+
+
+def shallow():
+    # like Named output: one generator of values
+    return ('value %d' % i for i in range(10000))
+
+
+def nested():
+    # like css() | map_if_list(...): lists of lists of strings
+    return [[('text', i), ['a', 'b', ['c']]] for i in range(2000)]
+
+
+def deep():
+    obj = 'leaf'
+    for i in range(2000):
+        obj = [obj, i]
+    return obj
+
+
+def scalars():
+    # flattening a single label or value
+    return ['http://example.net/'] * 10000
+
+
+# values from extractors aren't flattened into lists but labels are
+CASES = (
+    ('shallow', shallow, should_iter_unless_list),
+    ('nested', nested, should_iter),
+    ('deep', deep, should_iter),
+)
+
+
+def walked(obj, should_iter=should_iter_unless_list):
+    return chain.from_iterable(walk(obj, should_iter))
+
+
+def main():
+    for label, make, should in CASES:
+        times = []
+        for func in (walked, flatten):
+            times.append(min(timeit.repeat(
+                lambda: [v for v in func(make(), should)],
+                number=NUMBER, repeat=3)))
+        print('%s: walk %.3fs, flatten %.3fs' % ((label,) + tuple(times)))
+    times = []
+    for func in (walked, flatten):
+        times.append(min(timeit.repeat(
+            lambda: [list(func(s)) for s in scalars()],
+            number=NUMBER, repeat=3)))
+    print('scalars: walk %.3fs, flatten %.3fs' % tuple(times))
+    seconds = min(timeit.repeat(lambda: list(yield_values(shallow)),
+                                number=NUMBER, repeat=3))
+    print('yield_values (shallow): %.3fs' % seconds)
+
+
+if __name__ == '__main__':
+    main()
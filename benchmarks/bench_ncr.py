@@ -0,0 +1,41 @@
+""" Time cleaning numeric character references from a large page.
+
+Most pages have no invalid references, and cleaning those should take
+little more than a search through the text.  Run with::
+
+    $ python benchmarks/bench_ncr.py
+"""
+
+from __future__ import print_function, unicode_literals
+import timeit
+from wex.ncr import clean_ncr
+
+SIZE = 4 * 2**20
+ROW = ('<tr><td class="name"><a href="/p?a=1&amp;b=2">caf\xe9 &#233;</a>'
+       '</td><td>&lt;9.99&gt;</td></tr>\n')
+SCRIPT = '<script>var s = "&#150;" + "<p>";</script>\n'
+
+
+def page(invalid_every=None):
+    rows = []
+    for i in range(SIZE // len(ROW)):
+        if i % 100 == 0:
+            rows.append(SCRIPT)
+        if invalid_every and i % invalid_every == 0:
+            rows.append('<p>&#150;</p>')
+        rows.append(ROW)
+    return '<html><body><table>' + ''.join(rows) + '</table></body></html>'
+
+
+def main():
+    for label, invalid_every in (('no invalid references', None),
+                                 ('an invalid reference every 1000 rows', 1000),
+                                 ('an invalid reference every 10 rows', 10)):
+        text = page(invalid_every)
+        seconds = min(timeit.repeat(lambda: clean_ncr(text, True),
+                                    number=1, repeat=3))
+        print('%s: %.3fs' % (label, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+""" Time encoding extracted values as labelled JSON lines.
+
+The values from one response usually share their labels, so most of
+the time used to go on encoding the same labels again.  This compares
+encoding every field with :class:`json.JSONEncoder` (how it used to be
+done) with :class:`wex.value.TextEncoder`.  Run with::
+
+    $ python benchmarks/bench_output.py
+"""
+
+from __future__ import print_function, unicode_literals
+import timeit
+from itertools import product
+from wex.value import (Value, TextEncoder, encode_json, flatten,
+                       should_iter_unless_list, TAB, NL)
+
+NUMBER = 5
+
+URL = 'http://example.net/products/list?page=12'
+
+
+def values():
+    for i in range(2000):
+        yield Value((URL, 'product', 'name', 'Product number %d' % i))
+        yield Value((URL, 'product', 'price', i * 1.25))
+        yield Value((URL, 'product', 'stock', i))
+        yield Value((URL, 'product', 'tags', ['caf\xe9', None, True]))
+
+
+def encode_generic(values, write):
+    for value in values:
+        iterables = [map(encode_json, flatten(label))
+                     for label in value.labels]
+        flattened = flatten(value.value, should_iter_unless_list)
+        iterables.append(map(encode_json, flattened))
+        for fields in product(*iterables):
+            write(TAB.join(fields) + NL)
+
+
+def encode_fast(values, write):
+    encoder = TextEncoder()
+    for value in values:
+        encoder.write(value, write)
+
+
+def main():
+    vals = list(values())
+    times = []
+    for encode in (encode_generic, encode_fast):
+        lines = []
+        times.append(min(timeit.repeat(lambda: encode(vals, lines.append),
+                                       number=NUMBER, repeat=3)))
+    print('%d values: json %.3fs, TextEncoder %.3fs' %
+          ((len(vals),) + tuple(times)))
+
+
+if __name__ == '__main__':
+    main()
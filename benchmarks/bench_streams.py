@@ -0,0 +1,47 @@
+""" Time reading large pages through HTMLStream and the NCR replacer.
+
+Reading in small chunks (as lxml does) should take time proportional
+to the size of the page.  Run with::
+
+    $ python benchmarks/bench_streams.py
+"""
+
+from __future__ import print_function
+import timeit
+from six import BytesIO
+from wex.response import Response
+from wex.htmlstream import HTMLStream
+from wex.ncr import replace_invalid_ncr
+
+READ_SIZE = 1024
+ROW = u'<tr><td class="name">caf\xe9 &#150;</td><td>9.99</td></tr>\n'
+
+
+def response(size):
+    rows = ROW * (size // len(ROW))
+    content = (u'<html><body><table>' + rows + u'</table></body></html>')
+    return (b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/html; charset=utf-8\r\n\r\n' +
+            content.encode('utf-8'))
+
+
+def read_all(data):
+    stream = HTMLStream(Response.from_readable(BytesIO(data)))
+    fp = replace_invalid_ncr(stream)
+    while fp.read(READ_SIZE):
+        pass
+
+
+def main():
+    previous = None
+    for megabytes in (1, 2, 4, 8, 16):
+        data = response(megabytes * 2**20)
+        seconds = min(timeit.repeat(lambda: read_all(data),
+                                    number=1, repeat=3))
+        ratio = '' if previous is None else ' (x%.1f)' % (seconds / previous)
+        print('%2d MB: %.3fs%s' % (megabytes, seconds, ratio))
+        previous = seconds
+
+
+if __name__ == '__main__':
+    main()
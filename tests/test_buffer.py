@@ -0,0 +1,23 @@
+from wex.buffer import ChunkBuffer
+
+
+def test_chunk_buffer():
+    buf = ChunkBuffer()
+    buf.append('abc')
+    buf.append('')
+    buf.append('defgh')
+    assert len(buf) == 8
+    assert buf.read(2) == 'ab'
+    assert buf.read(2) == 'cd'
+    assert buf.read(3) == 'efg'
+    buf.append('ij')
+    assert len(buf) == 3
+    assert buf.read() == 'hij'
+    assert buf.read(10) == ''
+    assert len(buf) == 0
+
+
+def test_chunk_buffer_bytes():
+    buf = ChunkBuffer(b'')
+    buf.append(b'abc')
+    assert buf.read(-1) == b'abc'
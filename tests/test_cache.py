@@ -1,4 +1,5 @@
-from wex.cache import cached, Cache
+from wex.cache import (cached, Cache, LRUCache, ResponseScope, ProcessScope,
+                       HostScope, scopes)
 import pytest
 
 
@@ -21,6 +22,39 @@ def test_cache_unhashable():
         assert len(Cache.get()) == 0
 
 
+def test_cache_unhashable_by_identity(monkeypatch):
+    monkeypatch.setitem(scopes, 'response', ResponseScope())
+    calls = []
+
+    @cached
+    def total(values):
+        calls.append(values)
+        return sum(values)
+
+    values = [1, 2]
+    with Cache():
+        assert total(values) == 3
+        assert total(values) == 3
+        # an equal list is a different argument
+        assert total([1, 2]) == 3
+    assert len(calls) == 2
+    stats = scopes['response'].stats()
+    assert stats['identity_hits'] == 1
+    assert stats['identity_misses'] == 2
+
+
+def test_cache_unhashable_uncached(monkeypatch):
+    monkeypatch.setitem(scopes, 'process', ProcessScope())
+
+    @cached(scope='process')
+    def length(values):
+        return len(values)
+
+    assert length([1]) == 1
+    assert length([1]) == 1
+    assert scopes['process'].stats()['uncached'] == 2
+
+
 def test_nested_caches():
     with Cache() as c1:
         with Cache() as c2:
@@ -36,3 +70,65 @@ def test_cache_attribute_error():
         with Cache():
             # create AttributeError in __exit__
             del Cache.local.stack
+
+
+def test_lru_cache():
+    lru = LRUCache(maxsize=2)
+    lru['a'] = 1
+    lru['b'] = 2
+    assert lru['a'] == 1
+    lru['c'] = 3
+    assert 'b' not in lru
+    assert 'a' in lru
+    with pytest.raises(KeyError):
+        lru['b']
+    assert lru.stats() == {'size': 2, 'maxsize': 2, 'hits': 1,
+                           'misses': 1, 'evictions': 1}
+
+
+def test_cached_scope_unknown():
+    with pytest.raises(ValueError):
+        cached(scope='galaxy')
+
+
+def test_cached_process_scope(monkeypatch):
+    monkeypatch.setitem(scopes, 'process', ProcessScope(maxsize=2))
+    calls = []
+
+    @cached(scope='process')
+    def lookup(x):
+        calls.append(x)
+        return x * 2
+
+    with Cache():
+        assert lookup(1) == 2
+    with Cache():
+        assert lookup(1) == 2
+    assert lookup(2) == 4
+    assert lookup(3) == 6
+    assert calls == [1, 2, 3]
+    stats = scopes['process'].stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 3, 1)
+
+
+def test_cached_host_scope(monkeypatch):
+    monkeypatch.setitem(scopes, 'host', HostScope(maxsize=10, maxhosts=1))
+    calls = []
+
+    @cached(scope='host')
+    def config(name):
+        calls.append(name)
+        return len(calls)
+
+    with Cache(host='a.com'):
+        assert config('x') == 1
+    with Cache(host='a.com'):
+        assert config('x') == 1
+    with Cache(host='b.com'):
+        assert config('x') == 2
+    with Cache(host='a.com'):
+        # a.com was evicted to make room for b.com
+        assert config('x') == 3
+    # outside of a response nothing is cached
+    assert config('x') == 4
+    assert scopes['host'].stats()['host_evictions'] == 2
@@ -173,3 +173,20 @@ def test_write_extracted_values_tee_stdout_readable_has_no_name():
     writer = command.WriteExtractedValues(TeeStdOut, extract)
     ret = writer(readable)
     assert ret is None
+
+
+def test_write_extracted_values_encoder():
+    from wex.formats import NDJSONEncoder
+    readable = BytesIO(wexin)
+    written = []
+
+    class Writer(TeeStdOut):
+        def write(self, chunk):
+            written.append(chunk)
+
+    def extract(src):
+        yield 1
+    writer = command.WriteExtractedValues(Writer, extract,
+                                          encoder=NDJSONEncoder)
+    assert writer(readable) is None
+    assert written == ['{"labels":[],"value":1}\n']
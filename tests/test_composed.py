@@ -1,4 +1,5 @@
-from wex.composed import composable, ComposedCallable
+import pickle
+from wex.composed import compose, composable, ComposedCallable
 
 
 @composable
@@ -35,3 +36,50 @@ def test_composed_callable_identity():
     func = ComposedCallable()
     obj = object()
     assert func(obj) is obj
+
+
+def test_composed_callable_compile():
+    func = squared | add_1 | squared
+    compiled = func.compile()
+    assert compiled(2) == func.call(2) == 25
+
+
+def test_composed_callable_compile_inline():
+    from wex.etree import map_if_list
+    from wex.iterable import map_if_iter
+    func = map_if_list(add_1) | map_if_iter(squared)
+    assert list(func([1, 2])) == [4, 9]
+    assert list(func.compile()([1, 2])) == [4, 9]
+    assert func.compile()(2) == 9
+
+
+def test_composed_callable_compile_kw():
+
+    def add(x, n=1):
+        return x + n
+
+    func = compose(add, add)
+    assert func(1) == 3
+    assert func(1, n=2) == 5
+
+
+def test_composed_callable_compile_raises():
+
+    def fails(x):
+        raise ValueError(x)
+
+    func = squared | fails
+    try:
+        func(2)
+    except ValueError as exc:
+        assert exc.args == (4,)
+    else:
+        assert False, "expected ValueError"
+
+
+def test_composed_callable_pickle_after_call():
+    func = compose(add_1, add_1)
+    assert func(1) == 3
+    unpickled = pickle.loads(pickle.dumps(func))
+    assert unpickled.compiled is None
+    assert unpickled(1) == 3
@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+import os
+from multiprocessing import Process
+from wex.encodingcache import EncodingCache
+
+
+def test_encoding_cache_key():
+    key = EncodingCache.key('http://www.example.jp/a', ['shift_jis'])
+    assert key == 'www.example.jp shift_jis'
+    assert EncodingCache.key(None, []) == ''
+
+
+def test_encoding_cache_preferred():
+    cache = EncodingCache()
+    assert cache.preferred('example.jp') is None
+    cache.record('example.jp', 'shift_jis')
+    cache.record('example.jp', 'euc_jp')
+    cache.record('example.jp', 'euc_jp')
+    assert cache.preferred('example.jp') == 'euc_jp'
+
+
+def test_encoding_cache_save(tmpdir):
+    path = tmpdir.join('encodings.json').strpath
+    first = EncodingCache(path)
+    second = EncodingCache(path)
+    first.record('example.jp', 'shift_jis')
+    first.save()
+    second.record('example.jp', 'shift_jis')
+    second.record('example.jp', 'euc_jp')
+    second.save()
+    # counts from both are kept
+    assert EncodingCache(path).counts == {
+        'example.jp': {'shift_jis': 2, 'euc_jp': 1}
+    }
+    assert sorted(os.listdir(tmpdir.strpath)) == ['encodings.json',
+                                                  'encodings.json.lock']
+
+
+def record_and_save(path):
+    cache = EncodingCache(path)
+    for i in range(10):
+        cache.record('example.jp', 'shift_jis')
+    cache.save()
+
+
+def test_encoding_cache_save_from_processes(tmpdir):
+    path = tmpdir.join('encodings.json').strpath
+    processes = [Process(target=record_and_save, args=(path,))
+                 for i in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert EncodingCache(path).counts == {'example.jp': {'shift_jis': 80}}
+
+
+def test_encoding_cache_load_bad_file(tmpdir):
+    path = tmpdir.join('encodings.json')
+    path.write('not json')
+    assert EncodingCache(path.strpath).counts == {}
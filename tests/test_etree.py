@@ -6,10 +6,12 @@ import pytest
 from pkg_resources import resource_stream
 from six import BytesIO
 from lxml import html
+from lxml.cssselect import CSSSelector
 from wex.cache import Cache
 from wex.response import Response, parse_headers
 from wex import etree as e
 from wex.iterable import first, flatten
+from wex.extractor import Named
 
 skipif_travis_ci = pytest.mark.skipif(len(os.environ.get('TRAVIS_CI', '')),
                                       reason="mysterious parse failure")
@@ -121,6 +123,54 @@ def test_parse_ioerror():
     assert etree.getroot() is e.UNPARSEABLE
 
 
+class Stream(object):
+    """ A readable that can't seek (like a network connection). """
+
+    def __init__(self, data):
+        self.fp = BytesIO(data)
+        self.read = self.fp.read
+        self.readline = self.fp.readline
+
+    def close(self):
+        self.fp.close()
+
+
+def incremental_response(content):
+    data = (b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/html\r\n'
+            b'X-wex-request-url: http://some.com/\r\n'
+            b'\r\n' + content)
+    return Response.from_readable(Stream(data))
+
+
+def test_parse_incrementally(monkeypatch):
+    monkeypatch.setattr(Response, 'parse_incrementally', True)
+    content = '<title>café &#150;</title><p>' + 'x' * 100000
+    response = incremental_response(content.encode('utf-8'))
+    assert response.incremental_parser is not None
+    etree = e.parse(response)
+    assert response.incremental_parser.root is etree.getroot()
+    assert etree.xpath('//title/text()') == ['café \u2013']
+    assert len(etree.xpath('//p/text()')[0]) == 100000
+    assert e.get_base_url(etree) == 'http://some.com/'
+
+
+def test_parse_incrementally_next_decoder(monkeypatch):
+    monkeypatch.setattr(Response, 'parse_incrementally', True)
+    # the start looks like utf-8 but the end isn't
+    content = b'<p>caf\xc3\xa9</p>' + b'x' * 100000 + b'<p>\xe9</p>'
+    response = incremental_response(content)
+    etree = e.parse(response)
+    assert response.incremental_parser.root is None
+    assert etree.xpath('//p/text()')[-1] == '\xe9'
+
+
+def test_parse_incrementally_not_for_files(monkeypatch):
+    monkeypatch.setattr(Response, 'parse_incrementally', True)
+    response = create_response(example)
+    assert response.incremental_parser is None
+
+
 def test_xpath():
     f = e.xpath('//h1/text()') | list
     assert f(create_response(example)) == ['hi']
@@ -305,3 +355,149 @@ def test_drop_tree():
          e.drop_tree(e.css('script')) |
          e.xpath('string()'))
     assert f(create_response(example)) == ['Drop this please.']
+
+
+def test_compiled_selectors_are_cached():
+    hits = e.selector_cache.hits
+    assert e.css_selector('h1.cached') is e.css_selector('h1.cached')
+    assert (e.xpath_selector('//h1[@cached]') is
+            e.xpath_selector('//h1[@cached]'))
+    assert (e.xpath_selector('//h1[@cached]', {}) is not
+            e.xpath_selector('//h1[@cached]'))
+    assert e.selector_cache.hits == hits + 3
+    f = e.css('h1') | e.text
+    with Cache():
+        assert f(create_response(example)) == set(['hi'])
+
+
+def test_parse_simple_selector():
+    assert e.parse_simple_selector('h1') == ('h1', None, [])
+    assert e.parse_simple_selector('*.a.b') == (None, None, ['a', 'b'])
+    assert e.parse_simple_selector('p#x.c') == ('p', 'x', ['c'])
+    for expression in ('', 'div .a', 'h1, p', 'a[href]', 'p:first-child',
+                       '#a#b'):
+        assert e.parse_simple_selector(expression) is None
+
+
+selector_index_html = b"""HTTP/1.1 200 OK
+X-wex-request-url: http://some.com/
+
+<html>
+  <body class="a  b">
+    <h1 class="a" id="x">x</h1>
+    <!-- comment -->
+    <div class="b\ta"><p id="x" class="c">q</p><span class="a-b">s</span></div>
+  </body>
+</html>
+"""
+
+
+def test_selector_index_matches_css_selector():
+    expressions = ['h1', '.a', '.b.a', '#x', 'p#x.c', '*', 'span.a-b',
+                   '.a-b', 'div .a', '#nope', 'P']
+    response = create_response(selector_index_html)
+    with Cache():
+        tree = e.parse(response)
+        index = e.SelectorIndex(tree)
+        for expression in expressions:
+            expected = CSSSelector(expression)(tree)
+            selected = e.IndexedCSSSelector(expression)(tree)
+            assert selected == expected
+            simple = e.parse_simple_selector(expression)
+            if simple:
+                assert index.select(simple) == expected
+
+
+def test_selector_index_built_once_per_tree(monkeypatch):
+    built = []
+    class CountingIndex(e.SelectorIndex):
+        def __init__(self, tree):
+            built.append(tree)
+            super(CountingIndex, self).__init__(tree)
+    monkeypatch.setattr(e, 'SelectorIndex', CountingIndex)
+    expressions = ['h1', '.a', '.b.a', '#x', 'span.a-b', '.a-b', 'div']
+    attrs = dict((expression, e.css(expression) | e.text)
+                 for expression in expressions)
+    attrs['p'] = e.css('p#x.c') | e.text
+    extract = Named(**attrs)
+    with Cache():
+        values = list(extract(create_response(selector_index_html)))
+    assert ('p', 'q') in values
+    assert ('span.a-b', 's') in values
+    assert len(built) == 1
+
+
+def test_selector_index_after_drop_tree():
+    response = create_response(selector_index_html)
+    with Cache():
+        tree = e.parse(response)
+        for expression in ('h1', '.a', '.c'):
+            e.css(expression)(tree)
+        assert e.selector_index(tree) is not None
+        for elem in e.css('.a')(tree):
+            if elem.tag == 'div':
+                elem.drop_tree()
+        for expression in ('.a', 'div', 'p', '*'):
+            assert e.css(expression)(tree) == CSSSelector(expression)(tree)
+        assert e.css('div')(tree) == []
+
+
+def test_named_shared_prefix(monkeypatch):
+    selected = []
+    original = e.IndexedCSSSelector.__call__
+    def counting_call(self, arg):
+        selected.append(self.css)
+        return original(self, arg)
+    monkeypatch.setattr(e.IndexedCSSSelector, '__call__', counting_call)
+    extract = Named(
+        text=e.css('h1') | e.text,
+        id=e.css('h1') | e.attrib('id'),
+        cls=e.css('h1') | e.attrib('class'),
+    )
+    with Cache():
+        values = list(extract(create_response(selector_index_html)))
+    assert sorted(values) == [('cls', ['a']), ('id', ['x']), ('text', 'x')]
+    assert selected == ['h1']
+
+
+def test_named_shared_prefix_mutated():
+
+    def pop(elements):
+        elements.pop()
+        return len(elements)
+
+    extract = Named(
+        count1=e.css('div *') | pop,
+        count2=e.css('div *') | len,
+    )
+    with Cache():
+        values = list(extract(create_response(selector_index_html)))
+    assert sorted(values) == [('count1', 1), ('count2', 2)]
+
+
+def test_parse_only_non_ascii_is_nbsp():
+    response = create_response(b'HTTP/1.1 200 OK\r\n'
+                               b'Content-Type: text/html\r\n'
+                               b'\r\n'
+                               b'<p>Price:\xa010</p>')
+    assert e.text(e.css('p')(response)) == {'Price: 10'}
+
+
+def test_parse_clean_utf8_fast_path(monkeypatch):
+    def replace_invalid_ncr(stream):
+        raise AssertionError("slow path used")
+    monkeypatch.setattr(e, 'replace_invalid_ncr', replace_invalid_ncr)
+    response = create_response(b'HTTP/1.1 200 OK\r\n'
+                               b'Content-Type: text/html; charset=iso-8859-1\r\n'
+                               b'\r\n'
+                               b'<p>caf\xc3\xa9 &#8364;</p>')
+    with Cache():
+        assert (e.css('p') | e.text)(response) == set(['caf\xe9 €'])
+
+
+def test_parse_slow_path():
+    for content, text in [(b'<p>caf\xc3\xa9 &#150;</p>', 'caf\xe9 –'),
+                          (b'<p>caf\xe9</p>', 'caf\xe9')]:
+        response = create_response(b'HTTP/1.1 200 OK\r\n\r\n' + content)
+        with Cache():
+            assert (e.css('p') | e.text)(response) == set([text])
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import json
+import struct
+from wex.value import Value
+from wex import formats
+
+
+def encode(encoder, *values):
+    written = []
+    for value in values:
+        encoder.write(value, written.append)
+    encoder.flush(written.append)
+    return written
+
+
+def test_encode_json_field():
+    assert formats.encode_json_field('é') == '"é"'
+    assert formats.encode_json_field({'b': 1, 'a': [None]}) == '{"a":[null],"b":1}'
+    assert json.loads(formats.encode_json_field(object())).startswith('#<')
+
+
+def reject(constant):
+    raise ValueError("%s isn't JSON" % constant)
+
+
+def test_encode_json_field_not_finite():
+    nan, inf = float('nan'), float('inf')
+    assert formats.encode_json_field(nan) == 'null'
+    assert formats.encode_json_field(-inf) == 'null'
+    assert formats.encode_json_field(1.5) == '1.5'
+    assert (formats.encode_json_field({'a': [nan, 1.0], 'b': (inf,)}) ==
+            '{"a":[null,1.0],"b":[null]}')
+    assert formats.encode_json_field([nan, object()]).startswith('"#[nan, ')
+
+
+def test_ndjson_not_finite():
+    lines = encode(formats.NDJSONEncoder(), Value(('u', float('nan'))))
+    assert lines == ['{"labels":["u"],"value":null}\n']
+    assert json.loads(lines[0], parse_constant=reject) == {'labels': ['u'],
+                                                           'value': None}
+
+
+def test_columns_not_finite():
+    lines = encode(formats.ColumnsEncoder(), Value(('u', [float('inf')])))
+    assert lines == ['{"labels":[["u"]],"values":[[null]]}\n']
+
+
+def test_ndjson():
+    lines = encode(formats.NDJSONEncoder(),
+                   Value(('url', 'name', 'é')),
+                   Value(('url', ['a', 'b'], 1.5)),
+                   Value(ValueError('whoops')))
+    assert [json.loads(line) for line in lines] == [
+        {'labels': ['url', 'name'], 'value': 'é'},
+        {'labels': ['url', 'a'], 'value': 1.5},
+        {'labels': ['url', 'b'], 'value': 1.5},
+        {'labels': [], 'value': "#ValueError('whoops')!"},
+    ]
+    assert all(line.endswith('}\n') for line in lines)
+
+
+def test_pack():
+    assert formats.pack(None) == b'\xc0'
+    assert formats.pack(True) == b'\xc3'
+    assert formats.pack(1) == b'\x01'
+    assert formats.pack(-1) == b'\xff'
+    assert formats.pack(200) == b'\xcc\xc8'
+    assert formats.pack(-200) == b'\xd1\xff\x38'
+    assert formats.pack(2**40) == b'\xcf' + struct.pack('>Q', 2**40)
+    assert formats.pack(1.5) == b'\xcb' + struct.pack('>d', 1.5)
+    assert formats.pack('é') == b'\xa2\xc3\xa9'
+    assert formats.pack('x' * 40) == b'\xd9\x28' + b'x' * 40
+    assert formats.pack(b'\x00') == b'\xc4\x01\x00'
+    assert formats.pack([1, [2]]) == b'\x92\x01\x91\x02'
+    assert formats.pack({'b': 2, 'a': 1}) == b'\x82\xa1a\x01\xa1b\x02'
+
+
+def test_pack_field_unpackable():
+    assert formats.pack_field(2**64) == formats.pack('#%r!' % 2**64)
+    assert formats.pack_field(object()).startswith(b'\xd9')
+
+
+def test_msgpack():
+    records = encode(formats.MsgpackEncoder(),
+                     Value(('a', 1)),
+                     Value(('a', [2, 3])))
+    assert records == [
+        b'\x00\x00\x00\x04' + b'\x92\xa1a\x01',
+        b'\x00\x00\x00\x06' + b'\x92\xa1a\x92\x02\x03',
+    ]
+
+
+def test_columns():
+    lines = encode(formats.ColumnsEncoder(),
+                   Value(('url', 'name', 'x')),
+                   Value(('url', 'price', 1)),
+                   Value(('other', 2)),
+                   Value(3))
+    assert [json.loads(line) for line in lines] == [
+        {'labels': [], 'values': [3]},
+        {'labels': [['other']], 'values': [2]},
+        {'labels': [['url', 'url'], ['name', 'price']], 'values': ['x', 1]},
+    ]
+
+
+def test_columns_batch_size():
+    encoder = formats.ColumnsEncoder(batch_size=2)
+    lines = encode(encoder, *[Value(('a', i)) for i in range(5)])
+    assert [json.loads(line)['values'] for line in lines] == [
+        [0, 1], [2, 3], [4],
+    ]
+    assert encoder.batches == {}
@@ -3,9 +3,10 @@ from __future__ import unicode_literals
 import codecs
 from pkg_resources import resource_stream
 import pytest
-from six import text_type
+from six import text_type, BytesIO
 from wex.response import Response
-from wex.htmlstream import HTMLStream
+from wex.htmlstream import HTMLStream, IncrementalParser, detect
+from wex.encodingcache import EncodingCache
 
 
 def stream_from_fixture(fixture):
@@ -131,3 +132,118 @@ def test_htmlstream_default_encoding():
     text = stream.read()
     assert isinstance(text, text_type)
     assert text == '<p>�®</p>\n'
+
+
+def test_htmlstream_small_reads():
+    stream = stream_from_fixture('utf-8')
+    chunks = []
+    while True:
+        chunk = stream.read(3)
+        if not chunk:
+            break
+        assert len(chunk) <= 3
+        chunks.append(chunk)
+    assert ''.join(chunks) == '<p>©<p>\n'
+
+
+def test_htmlstream_encoding_cache(monkeypatch):
+    cache = EncodingCache()
+    monkeypatch.setattr(HTMLStream, 'encoding_cache', cache)
+    stream = stream_from_fixture('shift-jis-next-decoder')
+    with pytest.raises(UnicodeDecodeError):
+        stream.read()
+    stream.next_encoding()
+    stream.read()
+    stream.record_encoding()
+    # next time we try shift-jis first
+    stream = stream_from_fixture('shift-jis-next-decoder')
+    assert stream.encoding == 'shift_jis'
+    assert stream.read() == '<meta charset="utf-8">\n<p>巨<p>\n'
+
+
+def test_htmlstream_encoding_cache_ignores_fallback(monkeypatch):
+    cache = EncodingCache()
+    monkeypatch.setattr(HTMLStream, 'encoding_cache', cache)
+    stream = stream_from_fixture('default')
+    stream.next_encoding()
+    stream.read()
+    stream.record_encoding()
+    assert cache.counts == {}
+
+
+japanese = '<p>日本語のテキストです。東京都は晴れです。新しい製品を発表しました。</p>'
+
+
+def stream_from_bytes(content, content_type='text/html'):
+    head = ('HTTP/1.1 200 OK\r\n'
+            'Content-Type: {}\r\n'
+            'X-wex-request-url: http://example.jp/\r\n'
+            '\r\n'.format(content_type)).encode('ascii')
+    response = Response.from_readable(BytesIO(head + content))
+    return HTMLStream(response)
+
+
+def test_detect():
+    detected = detect(japanese.encode('shift-jis'))
+    assert detected[0][0] == 'shift_jis'
+    assert detected[0][1] > 0.5
+    assert detect(b'<p>just ASCII</p>') == []
+
+
+russian = ('<p>Москва является столицей России. Это крупнейший город '
+           'страны, в котором живут миллионы людей.</p>')
+
+french = ("<p>Le café est très agréable à Paris. Les élèves étudient la "
+          "théorie et la géométrie. Voilà une idée intéressante.</p>")
+
+
+def test_detect_single_byte():
+    assert detect(russian.encode('cp1251'))[0][0] == 'cp1251'
+    assert detect(russian.encode('cp1251'))[0][1] > 0.5
+    assert detect(french.encode('cp1252'))[0][0] == 'cp1252'
+    assert detect(french.encode('cp1252'))[0][1] > 0.5
+    # single-byte encodings decode these but not plausibly
+    assert detect(russian.encode('utf-8'))[0][0] == 'utf-8'
+    assert dict(detect(japanese.encode('shift-jis')))['cp1251'] < 0.5
+
+
+def test_htmlstream_detected_single_byte_encoding():
+    stream = stream_from_bytes(russian.encode('cp1251'))
+    assert stream.detected_encodings[0][0] == 'cp1251'
+    assert stream.encoding == 'cp1251'
+    assert stream.read() == russian
+
+
+def test_htmlstream_only_non_ascii_is_nbsp():
+    # spaces aren't counted when detecting so there is nothing to count
+    stream = stream_from_bytes(b'<p>Price:\xc2\xa010</p>',
+                               'text/html; charset=utf-8')
+    assert stream.read() == '<p>Price:\xa010</p>'
+    stream = stream_from_bytes(b'<p>Price:\xa010</p>')
+    parser = IncrementalParser(stream.response.headers, stream.response.url)
+    parser.feed(b'<p>Price:\xa010</p>')
+    # not utf-8 so it is left for the usual parse
+    assert parser.close() is None
+
+
+def test_htmlstream_detected_encoding():
+    # the declaration is wrong but we don't need to try utf-8 first
+    content = '<meta charset="utf-8">' + japanese
+    stream = stream_from_bytes(content.encode('shift-jis'))
+    assert stream.detected_encodings[0][0] == 'shift_jis'
+    assert stream.encoding == 'shift_jis'
+    assert stream.read() == content
+
+
+def test_htmlstream_detected_fallback():
+    # not even the best detected encoding decodes it all
+    content = (japanese * 1000).encode('shift-jis') + b'\xff\xff'
+    stream = stream_from_bytes(content)
+    assert stream.detected_encodings[0][0] == 'shift_jis'
+    assert len(stream.detected_encodings) == 1
+    with pytest.raises(UnicodeDecodeError):
+        stream.read()
+    # we replace errors using the detected encoding (not cp1252)
+    stream.next_encoding()
+    assert stream.encoding == 'shift_jis'
+    assert stream.read().startswith(japanese)
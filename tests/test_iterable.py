@@ -106,10 +106,89 @@ def test_flatten_string():
     assert list(i.flatten('abc')) == ['abc']
 
 
+def test_flatten_not_iterated_is_iterator():
+    flattened = i.flatten('abc')
+    assert next(flattened) == 'abc'
+    assert list(flattened) == []
+
+
 def test_flatten_nested():
     assert list(i.flatten([['a'], ['b', 'c']])) == ['a', 'b', 'c']
 
 
+def test_flatten_generators():
+    assert list(i.flatten(gen())) == sum(gen_walk_chunks, [])
+
+
+def test_flatten_deeply_nested():
+    obj = 'x'
+    for _ in range(5000):
+        obj = [obj, 'y']
+    flattened = list(i.flatten(obj))
+    assert flattened == ['x'] + ['y'] * 5000
+
+
+def test_flatten_raises():
+    flattened = i.flatten(gen(exc=True))
+    assert next(flattened) == '<gen>'
+    assert next(flattened) == '<gen_1>'
+    with pytest.raises(ValueError):
+        next(flattened)
+
+
+def test_flatten_custom_should_iter():
+    def should_iter(obj):
+        return isinstance(obj, list) and len(obj) > 1
+    assert list(i.flatten([[1], [2, 3]], should_iter)) == [[1], 2, 3]
+
+
+def test_flatten_do_not_iter_append():
+
+    class Leaf(list):
+        pass
+
+    assert list(i.flatten([Leaf([1])])) == [1]
+    old = i.do_not_iter
+    i._do_not_iter_append(Leaf)
+    try:
+        assert list(i.flatten([Leaf([1])])) == [Leaf([1])]
+    finally:
+        i.do_not_iter = old
+        for decisions in i.type_decisions.values():
+            decisions.clear()
+
+
+def test_decided_by_type():
+    calls = []
+
+    @i.decided_by_type
+    def should_iter(obj):
+        calls.append(obj)
+        return isinstance(obj, list)
+
+    assert list(i.flatten([[1, 2], [3]], should_iter)) == [1, 2, 3]
+    assert calls == [[[1, 2], [3]], 1]
+    assert should_iter([]) and not should_iter(4)
+    assert len(calls) == 2
+
+
+def test_do_not_iter_append_decorator():
+    old = i.do_not_iter
+    assert i.should_iter(set())
+    try:
+        @i.do_not_iter_append
+        class Leaf(set):
+            pass
+        assert not i.should_iter(Leaf())
+        # remembered answers are forgotten
+        assert i.should_iter(set())
+        assert list(i.flatten([Leaf([1])])) == [Leaf([1])]
+    finally:
+        i.do_not_iter = old
+        for decisions in i.type_decisions.values():
+            decisions.clear()
+
+
 def test_islice():
     f = i.islice(1) | list
     assert f(range(2)) == [0]
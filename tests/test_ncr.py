@@ -13,12 +13,23 @@ script = """
 elem = "<code>Hello &#x95;</code>"
 
 
-def test_end_char_ref():
-    assert ncr.end_char_ref.search('#123;').group(1) == '123'
+def test_invalid_ncr():
+    assert ncr.invalid_ncr.search('&#149;').group('ncr') == '149'
+    assert ncr.invalid_ncr.search('&#X0095;').group('ncr') == 'X0095'
 
 
-def test_end_char_ref_entity():
-    assert ncr.end_char_ref.search('amp;').group(1) is None
+def test_invalid_ncr_valid():
+    assert not ncr.invalid_ncr.search('&#1500; &#x100; &#x; &amp;')
+
+
+def test_clean_ncr_unchanged():
+    dirty = '<p>&#1500; &amp;</p>'
+    assert ncr.clean_ncr(dirty, True) == (dirty, '', None)
+
+
+def test_clean_ncr_partial_ncr():
+    assert ncr.clean_ncr('<p>&#15', False) == ('<p>', '&#15', None)
+    assert ncr.clean_ncr('&#150', True) == ('&#x2013', '', None)
 
 
 def test_clean_ncr():
@@ -87,3 +98,36 @@ def test_replace_invalid_ncr_comments():
     html = '<html><!-- end --></html><!-- trailing -->'
     fp = StringIO(html)
     assert ncr.replace_invalid_ncr(fp).read() == html
+
+
+def test_has_invalid_ncr():
+    assert not ncr.has_invalid_ncr(b'<p>&#8364; &#x20AC; &amp; &#;</p>')
+    assert ncr.has_invalid_ncr(b'<p>&#150;</p>')
+    assert ncr.has_invalid_ncr(b'<p>&#X96</p>')
+    assert ncr.has_invalid_ncr(b'<p>&#0;</p>')
+    assert ncr.has_invalid_ncr(b'<p>&#00013;</p>')
+
+
+def test_replacer_small_reads():
+    html = '<p>' + 'x' * 10 + '&#150;' + 'x' * 100 + '&#x95;</p>'
+    replacer = ncr.replace_invalid_ncr(StringIO(html))
+    chunks = []
+    while True:
+        chunk = replacer.read(50)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    assert ''.join(chunks) == ('<p>' + 'x' * 10 + '&#x2013;' + 'x' * 100 +
+                               '&#x2022;</p>')
+
+
+def test_replacer_reads_split_ncr():
+    html = '<p>&#150;' + 'x' * 100 + '&#x95;</p>'
+    replacer = ncr.replace_invalid_ncr(StringIO(html))
+    chunks = []
+    while True:
+        chunk = replacer.read(7)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    assert ''.join(chunks) == '<p>&#x2013;' + 'x' * 100 + '&#x2022;</p>'
@@ -0,0 +1,59 @@
+from io import FileIO
+import pytest
+from six import BytesIO
+from wex.readable import Open, partial
+from wex.prefilter import (HeadFilter, host_matches, status_range,
+                           filter_readables)
+
+
+def response_bytes(url, code=200, content_type='text/html'):
+    return ('HTTP/1.1 {} OK\r\n'
+            'Content-Type: {}\r\n'
+            'X-wex-url: {}\r\n'
+            '\r\n'
+            'body'.format(code, content_type, url)).encode('utf-8')
+
+
+def test_host_matches():
+    assert host_matches('.example.net', 'example.net')
+    assert host_matches('.example.net', 'www.example.net')
+    assert not host_matches('.example.net', 'badexample.net')
+    assert host_matches('www.*', 'www.example.net')
+    assert not host_matches('www.*', None)
+
+
+def test_status_range():
+    assert status_range('200') == (200, 200)
+    assert status_range('200-299') == (200, 299)
+    with pytest.raises(ValueError):
+        status_range('299-200')
+
+
+def test_empty_head_filter():
+    assert not HeadFilter()
+    assert HeadFilter(content_types=['text/*'])
+
+
+def test_filter_readables(tmpdir):
+    readables = []
+    for i, args in enumerate([
+            ('http://www.example.net/', 200),
+            ('http://www.example.net/', 301),
+            ('http://other.com/', 200),
+            ('http://www.example.net/img', 200, 'image/png')]):
+        path = tmpdir.join('{}.wexin'.format(i))
+        path.write(response_bytes(*args), 'wb')
+        readables.append(Open(partial(FileIO, path.strpath)))
+    readables.append(Open(partial(FileIO, tmpdir.join('missing').strpath)))
+    readables.append(BytesIO(response_bytes('http://www.example.net/x')))
+    readables.append(BytesIO(response_bytes('http://other.com/x')))
+
+    head_filter = HeadFilter(['.example.net'], [(200, 299)], ['text/*'])
+    filtered = list(filter_readables(readables, head_filter))
+
+    # unreadable readables are kept so the error is reported later
+    assert filtered[:2] == [readables[0], readables[4]]
+    # Open readables are still un-opened (so they can be pickled)
+    assert 'opened' not in filtered[0].__dict__
+    assert len(filtered) == 3
+    assert filtered[2].read(1024) == response_bytes('http://www.example.net/x')
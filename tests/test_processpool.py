@@ -153,3 +153,29 @@ def test_initializer_in_this_process():
         initargs=('foo',)
     )
     assert set(t.read().split()) == set([b'foo:7', b'foo:8'])
+
+
+def test_more_work_in_pool_with_chunksize():
+    t = tempfile.NamedTemporaryFile()
+    processpool.do(do_func, ((t.name, i) for i in range(3, 9)), chunksize=4)
+    assert (set(t.read().split()) ==
+            set([b'3', b'4', b'5', b'6', b'7', b'8', b'other=a', b'other=b']))
+
+
+def test_chunk_sizer_adapts_to_time_per_item():
+    sizer = processpool.ChunkSizer(target=0.1, maximum=50)
+    assert sizer.size == 1
+    sizer.update(1, 0.01)
+    assert sizer.size == 10
+    sizer.update(10, 0.0)
+    assert 10 < sizer.size <= 50
+    sizer.update(1, 1.0)
+    assert sizer.size == 1
+
+
+def test_chunk_sizer_fixed():
+    sizer = processpool.ChunkSizer(3)
+    sizer.update(3, 10.0)
+    assert sizer.size == 3
+    work = processpool.chunks(len, range(7), sizer)
+    assert [items for func, items in work] == [[0, 1, 2], [3, 4, 5], [6]]
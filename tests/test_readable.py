@@ -1,4 +1,5 @@
 import pickle
+import tarfile
 import pytest
 from io import FileIO
 from pkg_resources import resource_filename
@@ -7,8 +8,11 @@ from wex.response import DEFAULT_READ_SIZE
 from wex.readable import (ChainedReadable,
                           TeeReadable,
                           Open,
+                          FileSection,
                           partial as partial_,
                           tarfile_open,
+                          file_section_open,
+                          tarfile_tarinfo_open,
                           readables_from_paths,
                           readables_from_file_path)
 
@@ -147,3 +151,36 @@ def test_tarfile_open_repeated_different_path():
     tf1 = tarfile_open(path1)
     tf2 = tarfile_open(path2)
     assert tf1 is not tf2
+
+
+def test_readables_from_file_path_where_path_is_tarfile_are_sections():
+    path = resource_filename(__name__, 'fixtures/example.tar')
+    readables = list(readables_from_file_path(path))
+    assert [r.open.func for r in readables] == [file_section_open] * len(readables)
+    with tarfile.open(path) as tf:
+        expected = [tf.extractfile(ti).read() for ti in tf
+                    if ti.name.endswith('.wexin')]
+    r0p = pickle.loads(pickle.dumps(readables[0]))
+    assert r0p.name == path
+    assert read_chunks(r0p, 7) == expected[0]
+    assert [read_chunks(r) for r in readables[1:]] == expected[1:]
+
+
+def test_readables_from_compressed_tarfile(tmpdir):
+    path = tmpdir.join('example.tar.gz').strpath
+    with tarfile.open(path, 'w:gz') as tf:
+        ti = tarfile.TarInfo('0.wexin')
+        ti.size = 3
+        tf.addfile(ti, BytesIO(b'foo'))
+    readables = list(readables_from_file_path(path))
+    assert readables[0].open.func is tarfile_tarinfo_open
+    assert [read_chunks(r) for r in readables] == [b'foo']
+
+
+def test_file_section_readline():
+    section = FileSection(BytesIO(b'abc\ndef\nghi'), 2, 7)
+    assert section.readline() == b'c\n'
+    assert section.readline(2) == b'de'
+    assert section.readline() == b'f\n'
+    assert section.read() == b'g'
+    assert section.read(10) == b''
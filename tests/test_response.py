@@ -1,11 +1,16 @@
 # coding: utf-8
 from __future__ import unicode_literals
+import mmap
+import copy
 import codecs
+from io import FileIO
 import pytest
 from pkg_resources import resource_stream
 from six.moves.http_client import BadStatusLine
 from six import BytesIO
-from wex.response import Response, DEFAULT_READ_SIZE
+from wex.response import (Response, MappedFile, SpoolBudget, LazyContent,
+                          DEFAULT_READ_SIZE)
+from wex.readable import Open, partial, file_section_open
 
 utf8_reader = codecs.getreader('UTF-8')
 
@@ -119,3 +124,124 @@ def test_warc_response():
     assert response.warc_protocol == b'WARC'
     assert response.warc_version == (1, 0)
     assert response.warc_headers.get('warc-type') == 'response'
+
+
+def test_mmap_content(tmpdir, monkeypatch):
+    monkeypatch.setattr(Response, 'mmap_content', True)
+    body = b'line1\nline2\n' + b'X' * 5000
+    wexin = tmpdir.join('0.wexin')
+    wexin.write(b'HTTP/1.1 200 OK\r\nX-wex-url: http://a.com/\r\n\r\n' + body,
+                'wb')
+    readable = Open(partial(FileIO, wexin.strpath))
+    response = Response.from_readable(readable)
+    assert isinstance(response.fp.file, MappedFile)
+    # the mapped content doesn't need the file to stay open
+    readable.close()
+    assert response.magic_bytes == body[:8]
+    assert response.readline() == b'line1\n'
+    assert response.read(3) == b'lin'
+    assert list(response) == [b'e2\n', b'X' * 5000]
+    response.seek(-2, 2)
+    assert response.read() == b'XX'
+    response.seek(0)
+    assert response.read() == body
+
+
+def test_mmap_content_file_section(tmpdir, monkeypatch):
+    monkeypatch.setattr(Response, 'mmap_content', True)
+    data = (b'A' * mmap.ALLOCATIONGRANULARITY +
+            b'HTTP/1.1 200 OK\r\n\r\nhello' + b'B' * 10)
+    path = tmpdir.join('data')
+    path.write(data, 'wb')
+    start = mmap.ALLOCATIONGRANULARITY + 1
+    readable = Open(partial(file_section_open, path.strpath, start - 1,
+                            len(data) - start - 9))
+    response = Response.from_readable(readable)
+    assert isinstance(response.fp.file, MappedFile)
+    assert response.read() == b'hello'
+
+
+def test_mmap_content_not_for_other_readables(monkeypatch):
+    monkeypatch.setattr(Response, 'mmap_content', True)
+    response = build_response(content)
+    assert not isinstance(response.fp.file, MappedFile)
+    assert utf8_reader(response).read() == content
+
+
+def test_spool_budget(tmpdir, monkeypatch):
+    budget = SpoolBudget(limit=DEFAULT_READ_SIZE * 3, dir=tmpdir.strpath)
+    monkeypatch.setattr(Response, 'spool_budget', budget)
+    small = build_response('X' * DEFAULT_READ_SIZE)
+    assert not small.fp.file._rolled
+    assert budget.in_memory == DEFAULT_READ_SIZE
+    large = build_response('Y' * DEFAULT_READ_SIZE * 3)
+    assert large.fp.file._rolled
+    assert budget.in_memory == DEFAULT_READ_SIZE
+    assert budget.spills == 1
+    assert budget.spilled_bytes == DEFAULT_READ_SIZE * 3
+    assert large.read() == b'Y' * DEFAULT_READ_SIZE * 3
+    small.close()
+    large.close()
+    assert budget.in_memory == 0
+
+
+def test_spool_budget_released_after_values_from_readable(monkeypatch):
+    budget = SpoolBudget()
+    monkeypatch.setattr(Response, 'spool_budget', budget)
+    readable = BytesIO(b'FTP/1.0 200 OK\r\n\r\nhello')
+    values = Response.values_from_readable(lambda src: (src.read(),),
+                                           readable)
+    assert list(values) == [(b'hello',)]
+    assert budget.in_memory == 0
+
+
+class CountingBytesIO(BytesIO):
+
+    def __init__(self, *args):
+        BytesIO.__init__(self, *args)
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return BytesIO.read(self, *args)
+
+
+def test_content_read_lazily():
+    readable = CountingBytesIO(b'HTTP/1.1 200 OK\r\nX-wex-url: http://a.com/\r\n'
+                               b'\r\nhello')
+    response = Response.from_readable(readable)
+    assert response.url == 'http://a.com/'
+    assert response.headers.get('x-wex-url') == 'http://a.com/'
+    assert readable.reads == 0
+    assert response.magic_bytes == b'hello'
+    assert readable.reads > 0
+    assert response.read() == b'hello'
+
+
+def test_content_not_read_if_unused():
+    readable = CountingBytesIO(b'HTTP/1.1 200 OK\r\n\r\nhello')
+    values = Response.values_from_readable(lambda src: src.code, readable)
+    assert list(values) == [(200,)]
+    assert readable.reads == 0
+
+
+def test_content_closed_before_use():
+    response = build_response(content)
+    response.close()
+    assert response.fp.closed
+    with pytest.raises(ValueError):
+        response.read()
+
+
+def test_lazy_content_copy():
+    opened = []
+
+    def content_file():
+        opened.append(True)
+        return b'', BytesIO(b'hello')
+
+    lazy = LazyContent(content_file)
+    for copied in (copy.copy(lazy), copy.deepcopy(lazy)):
+        assert isinstance(copied, LazyContent)
+    assert not opened
+    assert lazy.read() == b'hello'
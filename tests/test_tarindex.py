@@ -0,0 +1,89 @@
+import os
+import shutil
+import tarfile
+from six import BytesIO
+from pkg_resources import resource_filename
+from wex.readable import readables_from_file_path
+from wex.prefilter import HeadFilter, filter_readables
+from wex import tarindex
+
+
+def read_all(readable):
+    return readable.read()
+
+
+def make_tar(path, members):
+    with tarfile.open(path, 'w') as tf:
+        for name, data in members:
+            ti = tarfile.TarInfo(name)
+            ti.size = len(data)
+            tf.addfile(ti, BytesIO(data))
+
+
+def response_bytes(url, code=200):
+    return ('HTTP/1.1 {} OK\r\nX-wex-url: {}\r\n\r\nbody'
+            .format(code, url).encode('utf-8'))
+
+
+def test_tar_index_created_and_reused(tmpdir):
+    path = tmpdir.join('example.tar').strpath
+    shutil.copy(resource_filename(__name__, 'fixtures/example.tar'), path)
+    before = [read_all(r) for r in readables_from_file_path(path)]
+    assert not os.path.exists(tarindex.index_path(path))
+
+    indexed = [read_all(r) for r in readables_from_file_path(path, True)]
+    assert indexed == before
+    assert os.path.exists(tarindex.index_path(path))
+    entries = tarindex.load_index(path)
+    assert entries[0]['url'] == 'http://httpbin.org/get?this=that'
+    assert entries[0]['code'] == 200
+    assert entries[0]['content_type'] == 'application/json'
+
+    # the index is used rather than re-scanning the tar file
+    with open(tarindex.index_path(path), 'a') as fp:
+        fp.write('{"name": "x", "offset": 0, "size": 3, '
+                 '"url": null, "code": null, "content_type": null}\n')
+    indexed = [read_all(r) for r in readables_from_file_path(path, True)]
+    assert len(indexed) == len(before) + 1
+
+
+def test_tar_index_rebuilt_when_tar_changes(tmpdir):
+    path = tmpdir.join('a.tar').strpath
+    make_tar(path, [('0.wexin', response_bytes('http://a.com/'))])
+    with tarfile.open(path) as tf:
+        assert len(tarindex.tar_index(tf, '.wexin')) == 1
+    make_tar(path, [('0.wexin', response_bytes('http://a.com/')),
+                    ('1.wexin', response_bytes('http://b.com/x', 404))])
+    os.utime(path, (0, 0))
+    with tarfile.open(path) as tf:
+        entries = tarindex.tar_index(tf, '.wexin')
+    assert [e['code'] for e in entries] == [200, 404]
+
+
+def test_tar_index_not_for_compressed(tmpdir):
+    path = tmpdir.join('a.tar.gz').strpath
+    with tarfile.open(path, 'w:gz') as tf:
+        ti = tarfile.TarInfo('0.wexin')
+        tf.addfile(ti, BytesIO())
+    with tarfile.open(path) as tf:
+        assert tarindex.tar_index(tf, '.wexin') is None
+    assert [read_all(r) for r in readables_from_file_path(path, True)] == [b'']
+
+
+def test_tar_index_filters_by_head(tmpdir, monkeypatch):
+    path = tmpdir.join('a.tar').strpath
+    make_tar(path, [('0.wexin', response_bytes('http://a.com/')),
+                    ('1.wexin', response_bytes('http://b.com/x', 404)),
+                    ('2.wexin', response_bytes('http://a.com/x', 404))])
+    head_filter = HeadFilter(['a.com'], [(200, 299)])
+    # build the index
+    list(readables_from_file_path(path, True))
+
+    def head_from_readable(*args):
+        raise AssertionError("head read again")
+
+    monkeypatch.setattr(tarindex.Response, 'head_from_readable',
+                        head_from_readable)
+    readables = readables_from_file_path(path, True, head_filter)
+    filtered = list(filter_readables(readables, head_filter))
+    assert [read_all(r) for r in filtered] == [response_bytes('http://a.com/')]
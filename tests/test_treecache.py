@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+from six import BytesIO
+from lxml.etree import tostring
+from lxml.html import HtmlElement
+from wex.cache import Cache
+from wex.response import Response
+from wex.treecache import TreeCache
+from wex import etree as e
+
+example = b"""HTTP/1.1 200 OK\r
+Content-Type: text/html; charset=utf-8\r
+X-wex-request-url: http://some.com/\r
+\r
+<html><head><base href="/base/"></head>
+<body><h1>caf\xc3\xa9 &#150;</h1><script>if (a < b) {}</script></body></html>
+"""
+
+
+def parse(data):
+    with Cache():
+        return e.parse(Response.from_readable(BytesIO(data)))
+
+
+def test_tree_cache_key():
+    cache = TreeCache('unused')
+    key = cache.key(BytesIO(b'<p>hi</p>'), 'text/html')
+    assert key == cache.key(BytesIO(b'<p>hi</p>'), 'text/html')
+    assert key != cache.key(BytesIO(b'<p>hi</p>'), 'text/html; charset=gbk')
+    assert key != cache.key(BytesIO(b'<p>ho</p>'), 'text/html')
+
+
+def test_tree_cache_miss(tmpdir):
+    assert TreeCache(tmpdir.strpath).load('0123') is None
+
+
+def test_parse_tree_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(e, 'tree_cache', TreeCache(tmpdir.strpath))
+    parsed = parse(example)
+    assert len(tmpdir.listdir()) == 1
+    loaded = parse(example)
+    assert loaded is not parsed
+    assert tostring(loaded) == tostring(parsed)
+    assert isinstance(loaded.getroot(), HtmlElement)
+    assert loaded.xpath('//h1/text()') == ['café –']
+    assert e.get_base_url(loaded) == 'http://some.com/base/'
+
+
+def test_tree_cache_not_xml(tmpdir):
+    cache = TreeCache(tmpdir.strpath)
+    # this attribute name is fine in HTML but not in XML
+    tree = parse(b'HTTP/1.1 200 OK\r\n'
+                 b'Content-Type: text/html\r\n'
+                 b'\r\n'
+                 b'<p 1a="1">hi</p>')
+    cache.save('abcd', tree)
+    assert os.path.getsize(cache.path('abcd')) == 0
+    assert cache.load('abcd') is None
+
+
+def test_tree_cache_not_same_tree(tmpdir, monkeypatch):
+    monkeypatch.setattr(e, 'tree_cache', TreeCache(tmpdir.strpath))
+    # loaded as XML, the svg elements would be in the SVG namespace
+    svg = (b'HTTP/1.1 200 OK\r\n'
+           b'Content-Type: text/html\r\n'
+           b'\r\n'
+           b'<body><svg xmlns="http://www.w3.org/2000/svg">'
+           b'<circle r="1"/></svg></body>')
+    circles = e.css('circle') | len
+    assert circles(parse(svg)) == 1
+    assert circles(parse(svg)) == 1
+    [subdir] = tmpdir.listdir()
+    [saved] = subdir.listdir()
+    assert saved.size() == 0
@@ -56,3 +56,36 @@ def test_yield_values_empty():
         if False:
             yield None
     assert list(yield_values(ex)) == []
+
+
+def test_encode_field_fast_paths():
+    from wex.value import encode_field, encode_json
+    for obj in (None, True, False, 0, -12, 1.5, 1e100, float('nan'),
+                float('inf'), 'a"\\\t é', ''):
+        assert encode_field(obj) == encode_json(obj)
+
+
+def test_text_encoder_remembers_labels():
+    from wex.value import TextEncoder
+    encoder = TextEncoder()
+    lines = []
+    encoder.write(Value(('url', 'a', 1)), lines.append)
+    encoder.write(Value(('url', 'a', [2, 3])), lines.append)
+    encoder.write(Value(('url', ['b', 'c'], None)), lines.append)
+    assert lines == [
+        '"url"\t"a"\t1\n',
+        '"url"\t"a"\t[2,3]\n',
+        '"url"\t"b"\tnull\n',
+        '"url"\t"c"\tnull\n',
+    ]
+    assert list(encoder.prefixes) == [('url', 'a')]
+
+
+def test_text_labels_product():
+    val = Value(([1, 2], 'x', iter([3, 4])))
+    assert list(val.text()) == ['1\t"x"\t3\n', '1\t"x"\t4\n',
+                                '2\t"x"\t3\n', '2\t"x"\t4\n']
+
+
+def test_text_empty_label():
+    assert list(Value(([], 1)).text()) == []
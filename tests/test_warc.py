@@ -0,0 +1,135 @@
+import gzip
+import pickle
+from six import BytesIO
+from wex.response import Response
+from wex.readable import readables_from_file_path
+from wex import warc
+
+
+def record(warc_type, block, uri='http://example.net/', extra=''):
+    headers = ('WARC/1.0\r\n'
+               'WARC-Type: {}\r\n'
+               'WARC-Target-URI: {}\r\n'
+               '{}'
+               'Content-Length: {}\r\n'
+               '\r\n').format(warc_type, uri, extra, len(block))
+    return headers.encode('utf-8') + block + b'\r\n\r\n'
+
+
+def http_response(body):
+    return (b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n\r\n' + body)
+
+
+records = [
+    record('warcinfo', b'software: test\r\n'),
+    record('request', b'GET / HTTP/1.1\r\n\r\n'),
+    record('response', http_response(b'one'), 'http://example.net/1'),
+    record('metadata', b'foo: bar\r\n'),
+    record('response', http_response(b'two'), 'http://example.net/2'),
+]
+
+
+def gzip_member(data):
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as fp:
+        fp.write(data)
+    return buf.getvalue()
+
+
+def responses(readables):
+    for readable in readables:
+        readable = pickle.loads(pickle.dumps(readable))
+        response = Response.from_readable(readable)
+        yield response.url, response.read()
+        readable.close()
+
+
+expected = [
+    ('http://example.net/1', b'one'),
+    ('http://example.net/2', b'two'),
+]
+
+
+def test_readables_from_warc(tmpdir):
+    path = tmpdir.join('crawl.warc')
+    path.write(b''.join(records), 'wb')
+    assert list(responses(readables_from_file_path(path.strpath))) == expected
+
+
+def test_readables_from_warc_gz(tmpdir):
+    path = tmpdir.join('crawl.warc.gz')
+    path.write(b''.join(gzip_member(r) for r in records), 'wb')
+    readables = readables_from_file_path(path.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_readables_from_warc_gz_with_large_headers(tmpdir):
+    # headers bigger than GzipFile's buffer make it seek to rewind
+    extra = 'WARC-Foo: {}\r\n'.format('x' * 20000)
+    path = tmpdir.join('crawl.warc.gz')
+    path.write(b''.join(gzip_member(record('response', http_response(b), u,
+                                           extra))
+                        for u, b in expected), 'wb')
+    readables = readables_from_file_path(path.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_readables_from_warc_gz_with_cdx(tmpdir):
+    path = tmpdir.join('crawl.warc.gz')
+    members = [gzip_member(r) for r in records]
+    path.write(b''.join(members), 'wb')
+    offsets = [sum(len(m) for m in members[:i]) for i in range(len(members))]
+    cdx = [' CDX N b a m s k r M S V g']
+    for i in (4, 2):
+        cdx.append('net,example)/ 20150101000000 http://example.net/ '
+                   'text/plain 200 - - - {} {} crawl.warc.gz'
+                   .format(len(members[i]), offsets[i]))
+    cdx.append('net,example)/ 20150101000000 http://example.net/ '
+               'text/plain 200 - - - 1 1 other.warc.gz')
+    tmpdir.join('crawl.warc.gz.cdx').write('\n'.join(cdx) + '\n')
+    readables = readables_from_file_path(path.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_readables_from_warc_gz_with_cdx_revisit(tmpdir):
+    path = tmpdir.join('crawl.warc.gz')
+    members = [gzip_member(r) for r in records]
+    members.append(gzip_member(record('revisit', http_response(b''))))
+    path.write(b''.join(members), 'wb')
+    offsets = [sum(len(m) for m in members[:i]) for i in range(len(members))]
+    cdx = [' CDX N b a m s k r M S V g']
+    for i in (2, 4, 5):
+        cdx.append('net,example)/ 20150101000000 http://example.net/ '
+                   'text/plain 200 - - - {} {} crawl.warc.gz'
+                   .format(len(members[i]), offsets[i]))
+    tmpdir.join('crawl.warc.gz.cdx').write('\n'.join(cdx) + '\n')
+    readables = readables_from_file_path(path.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_readables_from_warc_gz_with_cdx_without_offsets(tmpdir):
+    path = tmpdir.join('crawl.warc.gz')
+    path.write(b''.join(gzip_member(r) for r in records), 'wb')
+    cdx = [' CDX N b a m s k r',
+           'net,example)/ 20150101000000 http://example.net/ '
+           'text/plain 200 - -']
+    tmpdir.join('crawl.warc.gz.cdx').write('\n'.join(cdx) + '\n')
+    readables = readables_from_file_path(path.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_readables_from_dir_with_warc(tmpdir):
+    tmpdir.join('crawl.warc').write(b''.join(records), 'wb')
+    readables = readables_from_file_path(tmpdir.strpath)
+    assert list(responses(readables)) == expected
+
+
+def test_gzip_members_on_chunk_boundary(monkeypatch):
+    members = [gzip_member(r) for r in records[:2]]
+    monkeypatch.setattr(warc, 'READ_SIZE', len(members[0]))
+    found = list(warc.gzip_members(BytesIO(b''.join(members))))
+    assert [(offset, size) for offset, size, head in found] == [
+        (0, len(members[0])),
+        (len(members[0]), len(members[1])),
+    ]
+    assert found[1][2] == records[1]
@@ -0,0 +1,49 @@
+""" A first-in, first-out buffer for stream adapters. """
+
+from __future__ import unicode_literals
+from collections import deque
+
+
+class ChunkBuffer(object):
+    """ A first-in, first-out buffer of text (or bytes) chunks.
+
+    Appending and reading cost time proportional to the data
+    appended or read, not to how much data is in the buffer,
+    so reading a large buffer in small pieces takes linear time.
+    """
+
+    def __init__(self, empty=''):
+        self.empty = empty
+        self.chunks = deque()
+        # how much of the first chunk has already been read
+        self.offset = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, chunk):
+        if chunk:
+            self.chunks.append(chunk)
+            self.size += len(chunk)
+
+    def read(self, size=None):
+        """ Remove and return up to `size` (default all) items. """
+        if size is None or size < 0 or size >= self.size:
+            size = self.size
+        parts = []
+        remaining = size
+        while remaining > 0:
+            chunk = self.chunks[0]
+            end = self.offset + remaining
+            if end >= len(chunk):
+                parts.append(chunk[self.offset:] if self.offset else chunk)
+                remaining -= len(chunk) - self.offset
+                self.chunks.popleft()
+                self.offset = 0
+            else:
+                parts.append(chunk[self.offset:end])
+                self.offset = end
+                remaining = 0
+        self.size -= size
+        return self.empty.join(parts)
@@ -1,11 +1,24 @@
+import logging
 import threading
+from functools import partial
+from collections import OrderedDict
 from .composed import wraps
 
 
 class Cache(dict):
+    """ Values cached (by :func:`cached`) while extracting one response.
+
+    :param host: the hostname of the response, for the ``'host'`` scope.
+    """
 
     local = threading.local()
 
+    def __init__(self, host=None):
+        dict.__init__(self)
+        self.host = host
+        #: Values for arguments that can't be hashed keyed by identity.
+        self.by_identity = {}
+
     def __enter__(self):
         try:
             stack = self.local.stack
@@ -30,19 +43,222 @@ class Cache(dict):
         return {}
 
 
-def cached(f):
-    """ Decorator to cache results keyed by function arguments. """
+def cached(f=None, scope='response'):
+    """ Decorator to cache results keyed by function arguments.
+
+    By default results are only kept while extracting from the current
+    response.  The name of a longer-lived scope in :data:`scopes` can be
+    given instead, for example::
+
+        @cached(scope='process')
+        def lookup(hostname):
+            ...
+
+    Only use a longer-lived scope when the arguments and results don't
+    belong to a response (e.g. strings rather than elements).
+
+    Arguments that can't be hashed (such as lists of elements) are
+    matched by identity in the ``'response'`` scope, so passing the
+    same list again gets the cached result.  Other scopes call `f`
+    every time for them.
+    """
+
+    if scope not in scopes:
+        raise ValueError("unknown cache scope %r" % scope)
+
+    if f is None:
+        return partial(cached, scope=scope)
 
     @wraps(f)
     def wrapper(*args):
-        cache = Cache.get()
+        cache_scope = scopes[scope]
+        cache = cache_scope.get()
         key = (f,) + args
         try:
             return cache[key]
         except TypeError:
-            return f(*args)
+            return cache_scope.call_unhashable(cache, f, args)
         except KeyError:
             result = cache[key] = f(*args)
             return result
 
     return wrapper
+
+
+class LRUCache(object):
+    """ A mapping holding at most `maxsize` items.
+
+    When full, the least recently used item is evicted to make room.
+    The `hits`, `misses` and `evictions` counters can be used to see
+    how effective the cache is.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        try:
+            # pop and re-insert to make this the most recently used
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.data[key] = value
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self):
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class Scope(object):
+    """ Base class for the :data:`scopes` used by :func:`cached`. """
+
+    def __init__(self):
+        #: The number of calls that couldn't be cached.
+        self.uncached = 0
+
+    def get(self):
+        """ Returns the mapping to cache values in. """
+        return {}
+
+    def call_unhashable(self, cache, f, args):
+        """ Returns ``f(*args)`` where `args` can't be hashed. """
+        self.uncached += 1
+        return f(*args)
+
+    def stats(self):
+        return {'uncached': self.uncached}
+
+
+class ResponseScope(Scope):
+    """ Caches for as long as the current :class:`Cache` (one response). """
+
+    def __init__(self):
+        Scope.__init__(self)
+        self.identity_hits = 0
+        self.identity_misses = 0
+
+    def get(self):
+        return Cache.get()
+
+    def call_unhashable(self, cache, f, args):
+        by_identity = getattr(cache, 'by_identity', None)
+        if by_identity is None:
+            # we aren't extracting from a response
+            return Scope.call_unhashable(self, cache, f, args)
+        # Keeping `args` in the cache stops their ids being reused for
+        # other objects while the cache lasts.  (Lists can't be weakly
+        # referenced so we can't use weakrefs instead.)
+        key = (f,) + tuple(map(id, args))
+        try:
+            result = by_identity[key][1]
+        except KeyError:
+            self.identity_misses += 1
+            result = f(*args)
+            by_identity[key] = (args, result)
+        else:
+            self.identity_hits += 1
+        return result
+
+    def stats(self):
+        stats = Scope.stats(self)
+        stats['identity_hits'] = self.identity_hits
+        stats['identity_misses'] = self.identity_misses
+        return stats
+
+
+class ProcessScope(Scope):
+    """ Caches up to `maxsize` values for the life of the process. """
+
+    def __init__(self, maxsize=4096):
+        Scope.__init__(self)
+        self.cache = LRUCache(maxsize)
+
+    def get(self):
+        return self.cache
+
+    def stats(self):
+        stats = Scope.stats(self)
+        stats.update(self.cache.stats())
+        return stats
+
+
+class HostScope(Scope):
+    """ Caches up to `maxsize` values for each of the `maxhosts` most
+    recently seen hosts, using the host of the current :class:`Cache`.
+    """
+
+    def __init__(self, maxsize=1024, maxhosts=64):
+        Scope.__init__(self)
+        self.maxsize = maxsize
+        self.hosts = LRUCache(maxhosts)
+
+    def get(self):
+        host = getattr(Cache.get(), 'host', None)
+        if host is None:
+            return {}
+        try:
+            return self.hosts[host]
+        except KeyError:
+            cache = self.hosts[host] = LRUCache(self.maxsize)
+            return cache
+
+    def stats(self):
+        stats = Scope.stats(self)
+        stats.update({
+            'hosts': len(self.hosts),
+            'maxhosts': self.hosts.maxsize,
+            'host_evictions': self.hosts.evictions,
+            'maxsize': self.maxsize,
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        })
+        for cache in self.hosts.data.values():
+            for name in ('hits', 'misses', 'evictions'):
+                stats[name] += getattr(cache, name)
+        return stats
+
+
+#: The scopes that :func:`cached` results can be kept in.
+scopes = {
+    'response': ResponseScope(),
+    'process': ProcessScope(),
+    'host': HostScope(),
+}
+
+
+def log_stats():
+    """ Log the statistics for each of the :data:`scopes`. """
+    logger = logging.getLogger(__name__)
+    for name, scope in sorted(scopes.items()):
+        stats = sorted(scope.stats().items())
+        logger.debug("%s cache: %s", name,
+                     ', '.join('%s=%s' % item for item in stats))
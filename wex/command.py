@@ -22,12 +22,20 @@ import errno
 import argparse
 import logging.config
 from multiprocessing import cpu_count
+from multiprocessing.util import Finalize
 from pkg_resources import resource_filename, EntryPoint
 from .readable import readables_from_paths
-from .response import Response
+from .response import Response, SpoolBudget
 from .processpool import do
-from .output import StdOut, TeeStdOut
-from .value import Value
+from .htmlstream import HTMLStream
+from .encodingcache import EncodingCache
+from .treecache import TreeCache
+from .cache import log_stats as log_cache_stats
+from . import etree
+from .prefilter import HeadFilter, status_range, filter_readables
+from .output import StdOut, BinaryStdOut, TeeStdOut
+from .value import Value, TextEncoder
+from .formats import formats
 from .entrypoints import extractor_from_entry_points
 
 
@@ -69,6 +77,121 @@ argparser.add_argument(
     help="set debug level on this logger"
 )
 
+argparser.add_argument(
+    '--format',
+    dest='output_format',
+    choices=sorted(formats),
+    default='tsv',
+    help="output format (default: tsv)",
+)
+
+argparser.add_argument(
+    '--tar-index',
+    action='store_true',
+    default=False,
+    help="read tar files using an index file (created if needed)",
+)
+
+argparser.add_argument(
+    '--mmap',
+    action='store_true',
+    default=False,
+    help="memory map content from files rather than copying it",
+)
+
+argparser.add_argument(
+    '--parse-incrementally',
+    action='store_true',
+    default=False,
+    help="parse HTML from URLs and pipes as it is read",
+)
+
+argparser.add_argument(
+    '--tree-cache',
+    metavar='DIR',
+    default=None,
+    help="save parsed HTML in this directory to load next time",
+)
+
+argparser.add_argument(
+    '--encoding-cache',
+    metavar='FILE',
+    default=None,
+    help="remember which encodings worked for each host in this file",
+)
+
+
+def byte_size(spec):
+    """ Returns the number of bytes in a size like '512M' or '2G'. """
+    multipliers = {'K': 2**10, 'M': 2**20, 'G': 2**30}
+    spec = spec.strip().upper()
+    multiplier = multipliers.get(spec[-1:], 1)
+    if spec[-1:] in multipliers:
+        spec = spec[:-1]
+    return int(spec) * multiplier
+
+
+spool_group = argparser.add_argument_group("Memory used for response content")
+
+spool_budget = spool_group.add_mutually_exclusive_group()
+
+spool_budget.add_argument(
+    '--memory-budget',
+    dest='memory_budget',
+    metavar='SIZE',
+    type=byte_size,
+    default=None,
+    help="shared between all processes (e.g. 8G)",
+)
+
+spool_budget.add_argument(
+    '--process-memory-budget',
+    dest='process_memory_budget',
+    metavar='SIZE',
+    type=byte_size,
+    default=None,
+    help="for each process (e.g. 512M)",
+)
+
+spool_group.add_argument(
+    '--spool-dir',
+    metavar='DIR',
+    default=None,
+    help="directory for content that exceeds the budget",
+)
+
+filter_group = argparser.add_argument_group(
+    "Only extract from responses (judged by status line and headers)"
+)
+
+filter_group.add_argument(
+    '--host',
+    dest='hosts',
+    metavar='PATTERN',
+    action='append',
+    default=[],
+    help="for hosts matching PATTERN (e.g. '.example.net' or 'www.*')",
+)
+
+filter_group.add_argument(
+    '--status',
+    dest='status_ranges',
+    metavar='RANGE',
+    type=status_range,
+    action='append',
+    default=[],
+    help="with a status code in RANGE (e.g. '200' or '200-299')",
+)
+
+filter_group.add_argument(
+    '--content-type',
+    dest='content_types',
+    metavar='GLOB',
+    action='append',
+    default=[],
+    help="with a content type matching GLOB (e.g. 'text/*')",
+)
+
 save_group = argparser.add_argument_group("Save extraction input and output")
 
 save_excl_group = save_group.add_mutually_exclusive_group()
@@ -111,6 +234,15 @@ process_pool_size.add_argument(
     help="with a pool size of N",
 )
 
+process_pool_size_group.add_argument(
+    '--chunk-size',
+    dest='chunk_size',
+    metavar='N',
+    type=int,
+    default=None,
+    help="send N inputs at a time to each process (default: adaptive)",
+)
+
 on_exc_group = argparser.add_argument_group("When an exception occurs")
 on_exc = on_exc_group.add_mutually_exclusive_group()
 
@@ -131,10 +263,11 @@ on_exc.add_argument(
 
 class WriteExtractedValues(object):
 
-    def __init__(self, stdout, extract, label_funcs=()):
+    def __init__(self, stdout, extract, label_funcs=(), encoder=TextEncoder):
         self.stdout = stdout
         self.extract = extract
         self.label_funcs = label_funcs
+        self.encoder = encoder
 
     def __call__(self, readable):
 
@@ -142,11 +275,12 @@ class WriteExtractedValues(object):
         try:
 
             with self.stdout(readable) as writer:
+                encoder = self.encoder()
                 for value in Response.values_from_readable(self.extract,
                                                            readable,
                                                            self.label_funcs):
-                    for line in value.text():
-                        writer.write(line)
+                    encoder.write(value, writer.write)
+                encoder.flush(writer.write)
 
         except IOError as exc:
 
@@ -169,6 +303,14 @@ class WriteExtractedValues(object):
 
 
 
+def finalize_at_exit():
+    # finalizers with an exitpriority are run as (pool) processes exit
+    Finalize(None, Response.spool_budget.log_stats, exitpriority=0)
+    Finalize(None, log_cache_stats, exitpriority=0)
+    if HTMLStream.encoding_cache is not None:
+        Finalize(None, HTMLStream.encoding_cache.save, exitpriority=0)
+
+
 def main():
 
     logging.config.fileConfig(default_logging_conf,
@@ -179,13 +321,38 @@ def main():
     for logger_name in args.log_debug:
         logging.getLogger(logger_name).setLevel(logging.DEBUG)
 
+    encoder = formats[args.output_format]
+    if args.save_dir and encoder is not TextEncoder:
+        # saved output is compared as tab-separated JSON by the tests
+        argparser.error("only tsv output can be saved")
+
     extract = extractor_from_entry_points()
     if args.save_dir:
-        func = WriteExtractedValues(TeeStdOut, extract, args.label_funcs)
+        stdout = TeeStdOut
+    elif encoder.binary:
+        stdout = BinaryStdOut
     else:
-        func = WriteExtractedValues(StdOut, extract, args.label_funcs)
+        stdout = StdOut
+    func = WriteExtractedValues(stdout, extract, args.label_funcs, encoder)
     Value.exit_on_exc = args.exit_on_exc
     Value.debug_on_exc = args.debug_on_exc
-
-    readables = readables_from_paths(args.paths, args.save_dir)
-    do(func, readables, pool_size=args.process_pool_size)
+    Response.mmap_content = args.mmap
+    Response.parse_incrementally = args.parse_incrementally
+
+    limit = args.process_memory_budget
+    if args.memory_budget is not None:
+        limit = args.memory_budget // max(args.process_pool_size, 1)
+    Response.spool_budget = SpoolBudget(limit, args.spool_dir)
+    if args.encoding_cache:
+        HTMLStream.encoding_cache = EncodingCache(args.encoding_cache)
+    if args.tree_cache:
+        etree.tree_cache = TreeCache(args.tree_cache)
+
+    head_filter = HeadFilter(args.hosts, args.status_ranges,
+                             args.content_types)
+    readables = readables_from_paths(args.paths, args.save_dir,
+                                     args.tar_index, head_filter)
+    if head_filter:
+        readables = filter_readables(readables, head_filter)
+    do(func, readables, pool_size=args.process_pool_size,
+       chunksize=args.chunk_size, initializer=finalize_at_exit)
@@ -30,8 +30,10 @@ used in combination with :func:`.named` extractors:
 
 """
 
+import sys
 from itertools import chain
 from functools import WRAPPER_ASSIGNMENTS, WRAPPER_UPDATES, partial as functools_partial
+from six import reraise, text_type, binary_type, integer_types
 from six.moves import map as six_map
 
 
@@ -120,13 +122,33 @@ class ComposedCallable(Composable):
 
     def __init__(self, *functions):
         self.functions = flatten_composed_callables(functions)
+        self.compiled = None
 
     def __call__(self, arg, **kw):
+        if self.compiled is None:
+            self.compiled = self.compile()
+        return self.compiled(arg, **kw)
+
+    def __getstate__(self):
+        # the compiled function can't be pickled (it is compiled again)
+        state = self.__dict__.copy()
+        state['compiled'] = None
+        return state
+
+    def call(self, arg, **kw):
+        """ Calls each function in turn (without compiling). """
         res = arg
         for func in self.functions:
             res = func(res, **kw)
         return res
 
+    def compile(self):
+        """ Returns a function equivalent to this one but quicker to call.
+
+        See :func:`compile_functions`.
+        """
+        return compile_functions(self.functions, self.call)
+
     def __compose__(self):
         return self.functions
 
@@ -136,6 +158,166 @@ class ComposedCallable(Composable):
                               self.functions)
 
 
+def compile_functions(functions, call_with_kw):
+    """ Returns a single function that calls each of `functions` in turn.
+
+    Instead of looping over `functions` the returned function calls
+    each one directly from generated code and functions that were
+    decorated with :func:`composable` are called without going
+    through the :class:`Composable` object.
+
+    A function may also provide an ``__inline__`` method returning
+    ``(source, names)`` where `source` is a Python expression of
+    ``res`` (the result so far) and ``{name}`` placeholders for the
+    objects in the `names` dict (see :class:`wex.etree.map_if_list`).
+    The expression is used in place of calling the function.
+
+    Keyword arguments are rare, so calls with them are passed on to
+    `call_with_kw` instead.
+    """
+    namespace = {'call_with_kw': call_with_kw}
+    lines = [
+        'def compiled(arg, **kw):',
+        '    if kw:',
+        '        return call_with_kw(arg, **kw)',
+        '    res = arg',
+    ]
+    for i, func in enumerate(functions):
+        inline = getattr(type(func), '__inline__', None)
+        if inline is not None:
+            source, names = inline(func)
+            placeholders = {}
+            for name, obj in names.items():
+                placeholders[name] = '{}_{}'.format(name, i)
+                namespace[placeholders[name]] = obj
+            lines.append('    res = ' + source.format(**placeholders))
+        else:
+            name = 'func_{}'.format(i)
+            namespace[name] = unwrap_composable(func)
+            lines.append('    res = {}(res)'.format(name))
+    lines.append('    return res')
+    code = compile('\n'.join(lines) + '\n', '<compiled composition>', 'exec')
+    exec(code, namespace)
+    return namespace['compiled']
+
+
+def unwrap_composable(func):
+    """ Returns the function wrapped by :meth:`Composable.decorate`. """
+    if isinstance(func, Composable):
+        call = vars(type(func)).get('__call__')
+        if isinstance(call, staticmethod):
+            return call.__func__
+    return func
+
+
+def shared_prefixes(named_functions):
+    """ Finds the leading functions shared by composed callables.
+
+    :param named_functions: maps names to tuples of functions (as in
+                            :attr:`ComposedCallable.functions`).
+
+    Returns a ``(lengths, shared)`` pair where `lengths` maps each name
+    that shares leading functions with another name to the length of
+    the longest prefix it shares and `shared` is the set of all shared
+    prefixes.  Names with functions that can't be hashed share nothing.
+    """
+    counts = {}
+    hashable = {}
+    for name, functions in named_functions.items():
+        try:
+            for i in range(1, len(functions) + 1):
+                counts[functions[:i]] = counts.get(functions[:i], 0) + 1
+        except TypeError:
+            continue
+        hashable[name] = functions
+    shared = set(prefix for prefix, count in counts.items() if count > 1)
+    lengths = {}
+    for name, functions in hashable.items():
+        for i in range(len(functions), 0, -1):
+            if functions[:i] in shared:
+                lengths[name] = i
+                break
+    return lengths, shared
+
+
+class SharedPrefixEvaluator(object):
+    """ Calls composed functions evaluating each shared prefix only once.
+
+    `shared` is a set of prefixes (tuples of functions) as returned by
+    :func:`shared_prefixes`.  The result of each shared prefix for `arg`
+    is kept (together with any exception it raised) so the callables
+    sharing it form a tree rather than separate chains.
+
+    A later function could change a shared result in place, so only
+    immutable results (see :func:`is_immutable`) are shared as they are.
+    Lists, dicts and sets are shared as a new (shallow) copy each time
+    and any other result (for example an iterator, which can only be
+    used once) is not kept.
+    """
+
+    def __init__(self, shared, arg, **kw):
+        self.shared = shared
+        self.arg = arg
+        self.kw = kw
+        self.results = {}
+
+    def __call__(self, functions, length):
+        """ Returns the result of calling `functions` (sharing `length`). """
+        res = self.prefix_result(functions, length)
+        for func in functions[length:]:
+            res = func(res, **self.kw)
+        return res
+
+    def prefix_result(self, functions, length):
+        prefix = functions[:length]
+        if prefix in self.results:
+            res, exc_info = self.results[prefix]
+            if exc_info:
+                reraise(*exc_info)
+            return share(res)
+        # start from the longest shorter shared prefix
+        start = length - 1
+        while start > 0 and functions[:start] not in self.shared:
+            start -= 1
+        try:
+            if start:
+                res = self.prefix_result(functions, start)
+            else:
+                res = self.arg
+            for func in functions[start:length]:
+                res = func(res, **self.kw)
+        except Exception:
+            self.results[prefix] = (None, sys.exc_info())
+            raise
+        if type(res) in copied_types or is_immutable(res):
+            self.results[prefix] = (res, None)
+            # we keep the original so nobody can change it
+            return share(res)
+        return res
+
+
+immutable_types = set([type(None), bool, int, float, complex,
+                       text_type, binary_type, frozenset] +
+                      list(integer_types))
+
+copied_types = {list: list, dict: dict, set: set}
+
+
+def is_immutable(obj):
+    """ Returns ``True`` if `obj` (and anything in it) can't be changed. """
+    if type(obj) is tuple:
+        return all(is_immutable(item) for item in obj)
+    return type(obj) in immutable_types
+
+
+def share(obj):
+    """ Returns `obj` or a copy of it if it could be changed. """
+    copy = copied_types.get(type(obj))
+    if copy is None:
+        return obj
+    return copy(obj)
+
+
 def wraps(wrapped,
           assigned = WRAPPER_ASSIGNMENTS,
           updated = WRAPPER_UPDATES):
@@ -0,0 +1,115 @@
+"""
+Remembers which encoding decoded responses from each host.
+
+When the right encoding for a response is not the first one that
+:class:`wex.htmlstream.HTMLStream` tries, the response is parsed more than
+once.  Some sites consistently declare one encoding and use another, so
+every response from them would be parsed twice.
+
+An :class:`EncodingCache` counts which encoding worked for each
+combination of hostname and declared encodings, and that encoding is
+tried first for later responses with the same combination.  The counts
+can be saved to a file so that they are used by later runs.  Processes
+saving to the same file take turns using a lock file next to it.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import io
+import json
+import errno
+import logging
+from contextlib import contextmanager
+from six.moves.urllib_parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+EXT_LOCK = '.lock'
+
+
+class EncodingCache(object):
+    """ Counts of the encodings that worked, keyed by host and declaration.
+
+    :param path: the file the counts are loaded from and saved to
+                 (if any).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.counts = {}
+        # counts added since we loaded (so we can merge when saving)
+        self.added = {}
+        if path is not None:
+            self.counts = load_counts(path)
+
+    @staticmethod
+    def key(url, declared):
+        """ Returns the key for a URL and its (ranked) declared encodings. """
+        hostname = urlparse(url or '').hostname or ''
+        return ' '.join([hostname] + list(declared))
+
+    def preferred(self, key):
+        """ Returns the encoding that has worked most often for `key`. """
+        counts = self.counts.get(key)
+        if not counts:
+            return None
+        return max(sorted(counts), key=counts.get)
+
+    def record(self, key, encoding):
+        """ Record that `encoding` worked for `key`. """
+        for counts in (self.counts, self.added):
+            by_encoding = counts.setdefault(key, {})
+            by_encoding[encoding] = by_encoding.get(encoding, 0) + 1
+
+    def save(self):
+        """ Add our new counts to those in the file (if we have a file). """
+        if self.path is None or not self.added:
+            return
+        # other processes may be saving too so use our own temporary file
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            # and hold the lock so their counts aren't lost
+            with locked(self.path + EXT_LOCK):
+                counts = load_counts(self.path)
+                for key, by_encoding in self.added.items():
+                    merged = counts.setdefault(key, {})
+                    for encoding, count in by_encoding.items():
+                        merged[encoding] = merged.get(encoding, 0) + count
+                with io.open(tmp, 'w', encoding='utf-8') as fp:
+                    fp.write(json.dumps(counts, sort_keys=True))
+                os.rename(tmp, self.path)
+        except (IOError, OSError) as exc:
+            if exc.errno not in (errno.EACCES, errno.EROFS, errno.EPERM):
+                raise
+            logger = logging.getLogger(__name__)
+            logger.debug("unable to save encodings to %s (%s)",
+                         self.path, exc)
+            return
+        self.counts = counts
+        self.added = {}
+
+
+@contextmanager
+def locked(path):
+    """ Holds an exclusive lock on the file `path` (where we can). """
+    with io.open(path, 'ab') as fp:
+        if fcntl is not None:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def load_counts(path):
+    try:
+        with io.open(path, 'r', encoding='utf-8') as fp:
+            counts = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return {}
+    return counts if isinstance(counts, dict) else {}
@@ -5,11 +5,13 @@ Composable functions for extracting data using
 
 from __future__ import absolute_import, unicode_literals, print_function
 import wex.py2compat ; assert wex.py2compat  # flake8: noqa
+import re
 import logging
+from collections import defaultdict
 from itertools import islice, chain
 from copy import deepcopy
 from operator import methodcaller, itemgetter
-from six import string_types, PY2
+from six import string_types, PY2, BytesIO
 from six.moves import map, reduce
 from six.moves.urllib_parse import urljoin, quote, unquote
 from lxml.etree import (XPath,
@@ -21,7 +23,7 @@ from lxml.cssselect import CSSSelector
 from lxml.html import XHTML_NAMESPACE, HTMLParser
 
 from .composed import composable, Composable
-from .cache import cached
+from .cache import cached, Cache, LRUCache
 from .iterable import _do_not_iter_append, filter_if_iter
 from .htmlstream import HTMLStream
 from .ncr import replace_invalid_ncr
@@ -60,6 +62,9 @@ _do_not_iter_append(_Element)
 
 UNPARSEABLE = Element('unparseable')
 
+#: A :class:`wex.treecache.TreeCache` (if any) for parsed documents.
+tree_cache = None
+
 base_href = XPath('//base[@href]/@href | //x:base[@href]/@href',
                   namespaces={'x': XHTML_NAMESPACE})
 
@@ -104,15 +109,41 @@ def parse(src):
         return src
 
     etree = _ElementTree()
+    tree_key = None
     try:
-        stream = HTMLStream(src)
         # Sometimes we get URLs containing characters that aren't
         # acceptable to lxml (e.g. "http:/foo.com/bar?this=array[]").
         # When this happens lxml will quote the whole URL.
         # We don't want to have to check for this so we just always
         # quote it here and then unquote it in the `base_url` function.
         quoted_base_url = quote_base_url(src.url) if src.url else src.url
-        while True:
+        incremental_parser = getattr(src, 'incremental_parser', None)
+        if incremental_parser is not None:
+            # reading the content (if it hasn't been read) parses it
+            src.seek(0)
+            root = incremental_parser.root
+            if root is not None:
+                etree = root.getroottree()
+                etree.docinfo.URL = quoted_base_url
+                return etree
+        if tree_cache is not None:
+            src.seek(0)
+            content_type = src.headers.get('content-type', '')
+            tree_key = tree_cache.key(src, content_type)
+            cached_tree = tree_cache.load(tree_key)
+            if cached_tree is not None:
+                cached_tree.docinfo.URL = quoted_base_url
+                return cached_tree
+        stream = HTMLStream(src)
+        content = stream.clean_utf8()
+        if content is not None:
+            # The fast path: let lxml decode the bytes itself rather than
+            # reading them through HTMLStream and the NCR replacer.
+            parser = HTMLParser(encoding='utf-8')
+            etree.parse(BytesIO(content), parser=parser,
+                        base_url=quoted_base_url)
+            stream.record_encoding()
+        while content is None:
             try:
                 fp = replace_invalid_ncr(stream)
                 # fp is a Unicode stream
@@ -121,6 +152,7 @@ def parse(src):
                 # but actually it seems just fine as long as you tell the parser to use 'utf-8'!?
                 parser = HTMLParser(encoding='utf-8')
                 etree.parse(fp, parser=parser, base_url=quoted_base_url)
+                stream.record_encoding()
                 break
             except UnicodeDecodeError as exc:
                 stream.next_encoding()
@@ -131,6 +163,8 @@ def parse(src):
     root = etree.getroot()
     if root is None:
         etree._setroot(UNPARSEABLE)
+    elif tree_key is not None:
+        tree_cache.save(tree_key, etree)
 
     return etree
 
@@ -162,6 +196,15 @@ class map_if_list(Composable):
     def __repr__(self):
         return '%s(%r)' % (self.__class__, self.func)
 
+    def __eq__(self, other):
+        return type(other) is type(self) and other.func == self.func
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self.func))
+
     def __compose__(self):
         return (self,)
 
@@ -170,6 +213,184 @@ class map_if_list(Composable):
             return [res for res in map(self.func, *args, **kwargs)]
         return self.func(*args, **kwargs)
 
+    def __inline__(self):
+        # see wex.composed.compile_functions
+        source = ('[{func}(item) for item in res] '
+                  'if isinstance(res, list) else {func}(res)')
+        return source, {'func': self.func}
+
+
+#: Compiled CSS selectors and XPath expressions shared by the process.
+selector_cache = LRUCache(maxsize=4096)
+
+
+def css_selector(expression):
+    """ Returns a (cached) compiled :class:`CSSSelector`. """
+    key = ('css', expression)
+    try:
+        return selector_cache[key]
+    except KeyError:
+        selector = selector_cache[key] = CSSSelector(expression)
+        return selector
+
+
+def xpath_selector(expression, namespaces=default_namespaces):
+    """ Returns a (cached) compiled :class:`XPath`. """
+    key = ('xpath', expression, tuple(sorted((namespaces or {}).items())))
+    try:
+        return selector_cache[key]
+    except KeyError:
+        selector = selector_cache[key] = XPath(expression,
+                                               namespaces=namespaces)
+        return selector
+
+
+# A "simple" selector is an (optional) tag with any number of #id
+# and .class parts.  These can be answered from a SelectorIndex.
+simple_selector_re = re.compile(r'^(?P<tag>[A-Za-z][\w-]*|\*)?'
+                                r'(?P<parts>(?:[.#][A-Za-z_-][\w-]*)*)$')
+simple_selector_part_re = re.compile(r'([.#])([\w-]+)')
+
+# same whitespace as XPath's normalize-space (which cssselect uses)
+class_split_re = re.compile('[ \t\r\n]+')
+
+#: Build a :class:`SelectorIndex` for a tree once this many simple
+#: selectors have been evaluated against the tree.
+SELECTOR_INDEX_THRESHOLD = 3
+
+
+def parse_simple_selector(expression):
+    """ Returns `(tag, id, classes)` or ``None`` if not a simple selector. """
+    match = simple_selector_re.match(expression.strip())
+    if not match or not expression.strip():
+        return None
+    tag = match.group('tag')
+    ids = []
+    classes = []
+    for prefix, name in simple_selector_part_re.findall(match.group('parts')):
+        (ids if prefix == '#' else classes).append(name)
+    if len(ids) > 1:
+        return None
+    return (None if tag == '*' else tag), (ids[0] if ids else None), classes
+
+
+class SelectorIndex(object):
+    """ The elements of a tree indexed by tag, id and class.
+
+    The index is built with a single walk of the tree.  After that,
+    simple selectors are answered from the index rather than each one
+    walking the whole tree again.
+
+    Elements removed from the tree after it was indexed (for example
+    with ``drop_tree()``) are not selected.  Elements added to the tree
+    and changes to ``class`` attributes are not seen by the index, so
+    trees that will be modified in these ways should be selected from
+    with a :class:`CSSSelector` rather than :func:`css`.
+    """
+
+    def __init__(self, tree):
+        self.root = tree.getroot()
+        self.elements = []
+        self.tags = defaultdict(list)
+        self.ids = defaultdict(list)
+        self.classes = defaultdict(list)
+        self.class_sets = {}
+        for elem in tree.iter():
+            tag = elem.tag
+            if not isinstance(tag, string_types):
+                # comments and processing instructions
+                continue
+            self.elements.append(elem)
+            self.tags[tag].append(elem)
+            id_ = elem.get('id')
+            if id_ is not None:
+                self.ids[id_].append(elem)
+            class_ = elem.get('class')
+            if class_:
+                class_set = frozenset(class_split_re.split(class_.strip()))
+                self.class_sets[elem] = class_set
+                for name in class_set:
+                    self.classes[name].append(elem)
+
+    def select(self, simple_selector):
+        """ Returns elements matching `simple_selector` in document order. """
+        tag, id_, classes = simple_selector
+        candidates = [self.elements]
+        if tag is not None:
+            candidates.append(self.tags.get(tag, []))
+        if id_ is not None:
+            candidates.append(self.ids.get(id_, []))
+        candidates.extend(self.classes.get(name, []) for name in classes)
+        smallest = min(candidates, key=len)
+        empty = frozenset()
+        return [elem for elem in smallest
+                if (tag is None or elem.tag == tag) and
+                   (id_ is None or elem.get('id') == id_) and
+                   self.class_sets.get(elem, empty).issuperset(classes) and
+                   self.attached(elem)]
+
+    def attached(self, elem):
+        """ Returns ``True`` if `elem` hasn't been removed from the tree. """
+        top = elem
+        for top in elem.iterancestors():
+            pass
+        return top is self.root
+
+
+def selector_index(tree):
+    """ Returns the :class:`SelectorIndex` for `tree` if it is worth it.
+
+    The index (and the count of selections used to decide if the index
+    is worth building) is kept in the current :class:`wex.cache.Cache`.
+    """
+    cache = Cache.get()
+    key = (SelectorIndex, tree)
+    if key in cache:
+        return cache[key]
+    count_key = (selector_index, tree)
+    count = cache[count_key] = (cache[count_key] + 1
+                                if count_key in cache else 1)
+    if count < SELECTOR_INDEX_THRESHOLD:
+        return None
+    index = cache[key] = SelectorIndex(tree)
+    return index
+
+
+class IndexedCSSSelector(object):
+    """ A CSS selector that can use a :class:`SelectorIndex`.
+
+    When many simple selectors are applied to the same tree (as when
+    a :class:`wex.extractor.Named` has many ``css(...) | text``
+    attributes) they are answered from one index of the tree.
+    Other selectors (and selections from elements rather than from
+    the whole tree) use the compiled :class:`CSSSelector`.
+    """
+
+    def __init__(self, expression):
+        self.css = expression
+        self.selector = css_selector(expression)
+        self.simple = parse_simple_selector(expression)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.css)
+
+    # equal selectors let Named share them (see wex.composed.shared_prefixes)
+    def __eq__(self, other):
+        return type(other) is type(self) and other.css == self.css
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self.css))
+
+    def __call__(self, arg):
+        if self.simple is not None and isinstance(arg, _ElementTree):
+            index = selector_index(arg)
+            if index is not None:
+                return index.select(self.simple)
+        return self.selector(arg)
+
 
 def css(expression):
     """ Returns a :func:`composable <wex.composed.composable>` callable that
@@ -182,7 +403,7 @@ def css(expression):
         The callable returned accepts a :class:`wex.response.Response`, a
         list of elements or an individual element as an argument.
     """
-    return parse | map_if_list(CSSSelector(expression))
+    return parse | map_if_list(IndexedCSSSelector(expression))
 
 
 def xpath(expression, namespaces=default_namespaces):
@@ -205,7 +426,7 @@ def xpath(expression, namespaces=default_namespaces):
             >>> selector = xpath('//h1')
 
     """
-    return parse | map_if_list(XPath(expression, namespaces=namespaces))
+    return parse | map_if_list(xpath_selector(expression, namespaces))
 
 
 def attrib(name, default=None):
@@ -13,6 +13,7 @@ Extractors can be combined in various ways.
 
 from __future__ import absolute_import, unicode_literals, print_function
 from .value import yield_values
+from .composed import ComposedCallable, shared_prefixes, SharedPrefixEvaluator
 
 
 OMITTED = object()
@@ -123,12 +124,19 @@ class Named(object):
         "name2"    "two"
 
     The ordering of sub-extractor output is arbitrary.
+
+    When sub-extractors are :class:`wex.composed.ComposedCallable`
+    objects that start with the same functions (for example
+    ``css('.product') | css('.price') | text`` and
+    ``css('.product') | css('.title') | text``) then the functions
+    they share are only called once.
     """
 
     set_trace = None
 
     def __init__(self, **kw):
         self.extractors = {}
+        self.prefixes = None
         for k, v in kw.items():
             self.add(v, k)
 
@@ -146,8 +154,23 @@ class Named(object):
         if self.set_trace:
             # Give a hook for debugging
             self.set_trace()
+        if self.prefixes is None:
+            self.prefixes = shared_prefixes(dict(
+                (name, extractor.functions)
+                for name, extractor in self.extractors.items()
+                if isinstance(extractor, ComposedCallable)
+            ))
+        lengths, shared = self.prefixes
+        evaluator = None
+        if lengths and len(args) == 1:
+            evaluator = SharedPrefixEvaluator(shared, args[0], **kwargs)
         for name, extractor in self.extractors.items():
-            for value in yield_values(extractor, *args, **kwargs):
+            if evaluator and name in lengths:
+                values = yield_values(evaluator, extractor.functions,
+                                      lengths[name])
+            else:
+                values = yield_values(extractor, *args, **kwargs)
+            for value in values:
                 yield value.label(name)
 
     __call__ = named
@@ -174,6 +197,7 @@ class Named(object):
         if label is None:
             label = extractor.__name__
         self.extractors[label] = extractor
+        self.prefixes = None
         return extractor
 
 
@@ -0,0 +1,272 @@
+"""
+Alternatives to tab-separated JSON for the output of the ``wex`` command.
+
+Tab-separated JSON is easy to process with Unix command line tools but
+a program reading it has to split each line and decode every field
+separately.  These formats can be loaded more quickly:
+
+``ndjson``
+    One JSON object per line, for example::
+
+        {"labels":["product","price"],"value":9.99}
+
+``msgpack``
+    Each line as a `MessagePack <https://msgpack.org/>`_ array of the
+    labels followed by the value, preceded by its size in bytes as a
+    4-byte big-endian unsigned integer.
+
+``columns``
+    The lines from each response as JSON objects holding a list
+    for each label position and a list of values, for example::
+
+        {"labels":[["product","product"],["price","name"]],"values":[9.99,"Bun"]}
+
+    There is an object for each number of labels, and an object holds
+    at most :data:`BATCH_SIZE` lines.
+
+The lines are the same as for tab-separated JSON: a value is output
+once for each combination of its flattened labels and flattened value.
+Values that can't be encoded are output as the string
+``"#<repr of value>!"`` (tab-separated JSON writes this without quotes).
+The JSON formats write NaN and infinite floats as ``null`` so that
+strict JSON parsers can read them.
+
+The format is selected with the ``--format`` argument to ``wex``.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import json
+import math
+import struct
+from six import text_type, binary_type, integer_types, PY2
+from .value import (TextEncoder, encode_field, encode_json, fast_encoders,
+                    json_encoder_kwargs)
+
+
+BATCH_SIZE = 1000
+
+
+# like encode_json but raises ValueError for NaN and infinity
+encode_strict_json = json.JSONEncoder(allow_nan=False,
+                                      **json_encoder_kwargs).encode
+
+
+def encode_json_field(obj):
+    """ Like :func:`wex.value.encode_field` but always valid JSON.
+
+    JSON has no NaN or infinity, so these floats (including any in lists,
+    tuples or dicts) are written as ``null``.
+    """
+    if type(obj) is float:
+        return float.__repr__(obj) if is_finite(obj) else 'null'
+    encode = fast_encoders.get(type(obj))
+    if encode is not None:
+        return encode(obj)
+    try:
+        try:
+            field = encode_strict_json(obj)
+        except ValueError:
+            field = encode_strict_json(finite(obj))
+    except TypeError:
+        # a repr isn't JSON so make it a string
+        return encode_json(encode_field(obj))
+    if isinstance(field, binary_type):
+        return field.decode('utf-8')
+    return field
+
+
+def is_finite(obj):
+    return obj == obj and not math.isinf(obj)
+
+
+def finite(obj, seen=()):
+    """ Returns `obj` with NaN and infinite floats replaced by ``None``. """
+    if isinstance(obj, float):
+        return obj if is_finite(obj) else None
+    if isinstance(obj, (list, tuple, dict)):
+        if id(obj) in seen:
+            raise ValueError("Circular reference detected")
+        seen = seen + (id(obj),)
+        if isinstance(obj, dict):
+            return dict((k, finite(v, seen)) for k, v in obj.items())
+        return [finite(item, seen) for item in obj]
+    return obj
+
+
+class NDJSONEncoder(TextEncoder):
+    """ Writes values as JSON objects, one per line. """
+
+    encode = staticmethod(encode_json_field)
+
+    end = '}\n'
+
+    def prefix(self, fields):
+        return '{"labels":[' + ','.join(fields) + '],"value":'
+
+
+def pack(obj):
+    """ Returns `obj` packed as MessagePack.
+
+    Raises :exc:`TypeError` (or :exc:`ValueError`) for objects that
+    can't be packed.  Like JSON objects, maps are packed with their
+    keys sorted.
+    """
+    if obj is None:
+        return b'\xc0'
+    if obj is True:
+        return b'\xc3'
+    if obj is False:
+        return b'\xc2'
+    if isinstance(obj, integer_types):
+        return pack_int(obj)
+    if isinstance(obj, float):
+        return b'\xcb' + struct.pack('>d', obj)
+    if PY2 and isinstance(obj, binary_type):
+        # json treats these as utf-8 encoded text
+        obj = obj.decode('utf-8')
+    if isinstance(obj, text_type):
+        return pack_text(obj)
+    if isinstance(obj, binary_type):
+        return sized(obj, b'\xc4', b'\xc5', b'\xc6')
+    if isinstance(obj, (list, tuple)):
+        return array_header(len(obj)) + b''.join(pack(item) for item in obj)
+    if isinstance(obj, dict):
+        items = sorted(obj.items())
+        return (map_header(len(items)) +
+                b''.join(pack(k) + pack(v) for k, v in items))
+    raise TypeError("%r can't be packed" % (obj,))
+
+
+def pack_int(obj):
+    if 0 <= obj < 0x80:
+        return struct.pack('B', obj)
+    if -0x20 <= obj < 0:
+        return struct.pack('b', obj)
+    if obj >= 0:
+        for code, fmt, limit in ((b'\xcc', '>B', 2**8),
+                                 (b'\xcd', '>H', 2**16),
+                                 (b'\xce', '>I', 2**32),
+                                 (b'\xcf', '>Q', 2**64)):
+            if obj < limit:
+                return code + struct.pack(fmt, obj)
+    else:
+        for code, fmt, limit in ((b'\xd0', '>b', 2**7),
+                                 (b'\xd1', '>h', 2**15),
+                                 (b'\xd2', '>i', 2**31),
+                                 (b'\xd3', '>q', 2**63)):
+            if obj >= -limit:
+                return code + struct.pack(fmt, obj)
+    raise ValueError("%r is too big to pack" % (obj,))
+
+
+def pack_text(obj):
+    data = obj.encode('utf-8')
+    if len(data) < 32:
+        return struct.pack('B', 0xa0 | len(data)) + data
+    return sized(data, b'\xd9', b'\xda', b'\xdb')
+
+
+def sized(data, code8, code16, code32):
+    size = len(data)
+    if size < 2**8:
+        return code8 + struct.pack('>B', size) + data
+    if size < 2**16:
+        return code16 + struct.pack('>H', size) + data
+    return code32 + struct.pack('>I', size) + data
+
+
+def array_header(size):
+    if size < 16:
+        return struct.pack('B', 0x90 | size)
+    if size < 2**16:
+        return b'\xdc' + struct.pack('>H', size)
+    return b'\xdd' + struct.pack('>I', size)
+
+
+def map_header(size):
+    if size < 16:
+        return struct.pack('B', 0x80 | size)
+    if size < 2**16:
+        return b'\xde' + struct.pack('>H', size)
+    return b'\xdf' + struct.pack('>I', size)
+
+
+def pack_field(obj):
+    try:
+        return pack(obj)
+    except (TypeError, ValueError):
+        return pack_text('#' + text_type(repr(obj)) + '!')
+
+
+class MsgpackEncoder(TextEncoder):
+    """ Writes values as size-prefixed MessagePack arrays. """
+
+    binary = True
+
+    encode = staticmethod(pack_field)
+
+    def write(self, value, write):
+        prefixes = self.label_prefixes(value.labels)
+        if not prefixes:
+            return
+        fields = self.fields(value.value)
+        for prefix in prefixes:
+            for field in fields:
+                record = prefix + field
+                write(struct.pack('>I', len(record)) + record)
+
+    def prefix(self, fields):
+        # the array holds the labels and the value
+        return array_header(len(fields) + 1) + b''.join(fields)
+
+
+class ColumnsEncoder(TextEncoder):
+    """ Writes batches of values as JSON objects of columns. """
+
+    encode = staticmethod(encode_json_field)
+
+    def __init__(self, batch_size=None):
+        super(ColumnsEncoder, self).__init__()
+        self.batch_size = batch_size or BATCH_SIZE
+        # (label columns, values) for each number of labels
+        self.batches = {}
+
+    def write(self, value, write):
+        prefixes = self.label_prefixes(value.labels)
+        if not prefixes:
+            return
+        fields = self.fields(value.value)
+        for prefix in prefixes:
+            batch = self.batches.get(len(prefix))
+            if batch is None:
+                batch = self.batches[len(prefix)] = ([[] for _ in prefix], [])
+            columns, values = batch
+            for field in fields:
+                for column, label in zip(columns, prefix):
+                    column.append(label)
+                values.append(field)
+            if len(values) >= self.batch_size:
+                self.write_batch(len(prefix), write)
+
+    def flush(self, write):
+        """ Write the values we have batched up. """
+        for size in sorted(self.batches):
+            self.write_batch(size, write)
+
+    def write_batch(self, size, write):
+        columns, values = self.batches.pop(size)
+        labels = ','.join('[' + ','.join(column) + ']' for column in columns)
+        write('{"labels":[' + labels + '],"values":[' + ','.join(values) +
+              ']}\n')
+
+    def prefix(self, fields):
+        return tuple(fields)
+
+
+#: The output formats by name.
+formats = {
+    'tsv': TextEncoder,
+    'ndjson': NDJSONEncoder,
+    'msgpack': MsgpackEncoder,
+    'columns': ColumnsEncoder,
+}
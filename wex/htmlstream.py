@@ -1,10 +1,15 @@
 """ HTMLStream converts a byte stream in to a unicode stream for parsing. """
 
 from __future__ import unicode_literals, print_function
+import re
 import codecs
+import unicodedata
+from six import BytesIO
 from six.moves import map
-from lxml.etree import XMLSyntaxError
+from lxml.etree import XMLSyntaxError, LxmlError
 from lxml.html import HTMLParser
+from .ncr import has_invalid_ncr, clean_ncr
+from .buffer import ChunkBuffer
 
 CHUNK_SIZE = 1024
 MAX_HEAD_CHUNKS = 50
@@ -75,6 +80,184 @@ ranking = {
 }
 
 
+#
+# When the start of a document (the pre-parse window) contains non-ASCII
+# bytes we can rank the encodings that decode it by how plausible the
+# decoded text is.  With the right encoding the words are made of letters
+# from one script (with common ideographs and few accented letters).
+# With the wrong one we see words that mix scripts, words made entirely
+# of accented letters, rare ideographs, half-width katakana and symbols.
+# The ranking above tells us how unlikely random bytes are to decode
+# without errors, so a clean decode counts for more with some encodings
+# than with others.  Single-byte encodings decode almost anything, so
+# for those we rely on plausibility alone: very plausible text is
+# likely to be right and anything less is treated as for other
+# encodings (which is never confident enough).
+
+# we also try these encodings when detecting
+detectable_encodings = [
+    'utf-8',
+    'cp1252',
+    'cp1251',
+    'shift_jis',
+    'euc_jp',
+    'gbk',
+    'big5',
+    'euc_kr',
+]
+
+# ignore the detected encodings if none are at least this confident
+MIN_CONFIDENCE = 0.5
+
+# single-byte encodings (by codec name) and how plausible text decoded
+# with them must be for the prior below to be used
+single_byte_encodings = set([
+    'cp1250', 'cp1251', 'cp1252', 'cp1253', 'cp1254', 'cp1255', 'cp1256',
+    'cp1257', 'cp1258', 'iso8859-1', 'iso8859-2', 'iso8859-5', 'iso8859-7',
+    'iso8859-11', 'iso8859-15', 'koi8-r', 'tis-620',
+])
+SINGLE_BYTE_MIN_PLAUSIBILITY = 0.9
+SINGLE_BYTE_PRIOR = 0.9
+
+# the number of non-ASCII characters that makes us half as confident
+# as we would otherwise be
+EVIDENCE_HALF = 4
+
+# confidence bonus for an encoding that is also declared
+DECLARED_BONUS = 0.25
+
+# judge plausibility on this many characters from the first non-ASCII one
+DETECT_CHARS = 4 * 1024
+
+# scripts that are used together in one word
+script_groups = {
+    'HIRAGANA': 'CJK',
+    'KATAKANA': 'CJK',
+    'KATAKANA-HIRAGANA': 'CJK',
+}
+
+# ranges of the most frequently used ideographs in some encodings
+common_ideograph_ranges = [
+    ('gb2312', b'\xb0\xa1', b'\xd7\xfe'),
+    ('euc_jp', b'\xb0\xa1', b'\xcf\xd3'),
+    ('big5', b'\xa4\x40', b'\xc6\x7e'),
+]
+
+non_ascii = re.compile(r'[^\x00-\x7f]', re.UNICODE)
+word_or_char = re.compile(r'\w+|\S', re.UNICODE)
+
+
+def script(char):
+    if char < '\x80':
+        return 'LATIN'
+    word = unicodedata.name(char, '').partition(' ')[0]
+    return script_groups.get(word, word)
+
+
+common_ideographs = {}
+
+
+def common_ideograph(char):
+    if char not in common_ideographs:
+        common_ideographs[char] = False
+        for encoding, low, high in common_ideograph_ranges:
+            try:
+                encoded = char.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            if low <= encoded <= high:
+                common_ideographs[char] = True
+                break
+    return common_ideographs[char]
+
+
+def plausible_chars(word):
+    """ Returns the number of non-ASCII characters in `word` that are
+    plausible (see :func:`plausibility`). """
+    non_ascii_chars = [char for char in word if char >= '\x80']
+    if len(word) == 1:
+        category = unicodedata.category(word)
+        if category[0] in 'NP' or category in ('Zs', 'Sc'):
+            return 1
+        if category[0] != 'L':
+            return 0
+    scripts = set(map(script, word))
+    if len(scripts) > 1:
+        return 0
+    if scripts == set(['LATIN']):
+        # accented letters are used within mostly unaccented words
+        if len(word) > 2 and len(non_ascii_chars) * 2 > len(word):
+            return 0
+        return len(non_ascii_chars)
+    if scripts == set(['HALFWIDTH']):
+        return 0
+    plausible = 0
+    for char in non_ascii_chars:
+        if not unicodedata.name(char, '').startswith('CJK'):
+            plausible += 1
+        elif common_ideograph(char):
+            plausible += 1
+    return plausible
+
+
+def plausibility(text):
+    """ Returns (plausibility, count) for the non-ASCII characters in `text`.
+
+    Plausibility is between 0 and 1 and is the fraction of non-ASCII
+    characters that are letters in plausible words, numbers, punctuation
+    or spaces.
+    """
+    first = non_ascii.search(text)
+    if not first:
+        return 0.0, 0
+    start = max(first.start() - 64, 0)
+    text = text[start:first.start() + DETECT_CHARS]
+    count = plausible = 0
+    for word in word_or_char.findall(text):
+        if non_ascii.search(word):
+            count += len(non_ascii.findall(word))
+            plausible += plausible_chars(word)
+    if not count:
+        # the only non-ASCII characters are spaces (e.g. U+00A0)
+        return 0.0, 0
+    return float(plausible) / count, count
+
+
+def is_single_byte(encoding):
+    try:
+        return codecs.lookup(encoding).name in single_byte_encodings
+    except LookupError:
+        return False
+
+
+def detect(sample, encodings=detectable_encodings):
+    """ Returns `(encoding, confidence)` pairs for `sample` best first.
+
+    Only encodings that decode `sample` without errors are included
+    and if `sample` is all ASCII then nothing is.
+    """
+    detected = []
+    for encoding in encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # the sample may end part way through a character
+            text = decoder.decode(sample, False)
+        except UnicodeDecodeError:
+            continue
+        quality, count = plausibility(text)
+        if not count:
+            continue
+        if (is_single_byte(encoding) and
+                quality >= SINGLE_BYTE_MIN_PLAUSIBILITY):
+            prior = SINGLE_BYTE_PRIOR
+        else:
+            prior = 0.5 + 0.5 * ranking.get(encoding, 0) / 100000
+        evidence = float(count) / (count + EVIDENCE_HALF)
+        detected.append((encoding, quality * prior * evidence))
+    detected.sort(key=lambda item: (-item[1], item[0]))
+    return detected
+
+
 BOM_ENC = {
     codecs.BOM_UTF8: codecs.lookup('utf-8').name,
     codecs.BOM_UTF16_BE: codecs.lookup('utf-16-be').name,
@@ -86,12 +269,18 @@ BOM_ENC = {
 
 class HTMLStream(object):
 
+    #: An :class:`wex.encodingcache.EncodingCache` (if any) that records
+    #: which encoding worked so that it can be tried first next time.
+    encoding_cache = None
+
     def __init__(self, response, filename=None):
         self.bom = None
         self.filename = filename
         self.encodings = []
         self.response = response
+        self.sample = b''
         self.declared_encodings = self.pre_parse()
+        self.detected_encodings = self.detect_encodings()
         self.decoders = self.yield_decoders()
         self.next_encoding()
 
@@ -113,20 +302,55 @@ class HTMLStream(object):
         # we want to try the most resilient encodings first
         return sorted(normalized, key=key, reverse=True)
 
+    def detect_encodings(self):
+        """ Likely encodings for the pre-parse window, best first.
+
+        These are the encodings that decode the pre-parse window and are
+        confident enough, counting a bonus for being declared.
+        """
+        if self.bom:
+            return []
+        ranked_encodings = self.ranked_encodings()
+        candidates = set(ranked_encodings).union(detectable_encodings)
+        likely = []
+        for encoding, confidence in detect(self.sample, sorted(candidates)):
+            if encoding in ranked_encodings:
+                confidence += DECLARED_BONUS
+            if confidence >= MIN_CONFIDENCE:
+                likely.append((encoding, confidence))
+        likely.sort(key=lambda item: -item[1])
+        return likely
+
     def yield_decoders(self):
 
         ranked_encodings = self.ranked_encodings()
 
-        # character set detection could go here
         if ranked_encodings:
             fallback = codecs.lookup(ranked_encodings[0])
         else:
             fallback = codecs.lookup('cp1252')
 
-        # ensure that utf-8 is tried first (as long as no utf is declared)
-        if not any(enc.startswith('utf-') for enc in ranked_encodings):
+        if self.encoding_cache is not None:
+            url = getattr(self.response, 'url', None)
+            self.encoding_key = self.encoding_cache.key(url, ranked_encodings)
+            preferred = self.encoding_cache.preferred(self.encoding_key)
+        else:
+            preferred = None
+
+        if self.detected_encodings:
+            # We don't try unlikely encodings (such as declared encodings
+            # that don't even decode the start of the document).
+            ranked_encodings = [enc for enc, _ in self.detected_encodings]
+            fallback = codecs.lookup(ranked_encodings[0])
+        elif not any(enc.startswith('utf-') for enc in ranked_encodings):
+            # ensure that utf-8 is tried first (as long as no utf is declared)
             ranked_encodings = ['utf-8'] + ranked_encodings
 
+        # unless something else has worked for this host before
+        if preferred in ranked_encodings:
+            ranked_encodings.remove(preferred)
+            ranked_encodings.insert(0, preferred)
+
         for encoding in ranked_encodings:
             info = codecs.lookup(encoding)
             decoder = info.incrementaldecoder()
@@ -137,26 +361,52 @@ class HTMLStream(object):
 
     def next_encoding(self):
         self.response.seek(0)
-        self.decoded = u''
+        self.decoded = ChunkBuffer()
         self.encoding, self.decoder = next(self.decoders)
         self.strip_bom = self.bom
 
+    def record_encoding(self):
+        """ Record that the current encoding decoded the response. """
+        if self.encoding_cache is None or self.decoder.errors != 'strict':
+            # the fallback always "works" so there is nothing to learn
+            return
+        self.encoding_cache.record(self.encoding_key, self.encoding)
+
+    def clean_utf8(self):
+        """ Returns the content if it can be parsed as UTF-8 bytes.
+
+        This is when UTF-8 is the first encoding we would try, all of
+        the content is valid UTF-8 and there are no invalid numeric
+        character references.  Otherwise ``None`` is returned and the
+        stream is ready to be read as usual.
+        """
+        if self.encoding != 'utf-8':
+            return None
+        self.response.seek(0)
+        content = self.response.read()
+        self.response.seek(0)
+        try:
+            content.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        if has_invalid_ncr(content):
+            return None
+        return content
+
     def read(self, size=None):
         while True:
             raw_bytes = self.response.read(size)
             if not raw_bytes:
                 # tell the decoder to flush
-                self.decoded += self.decoder.decode(raw_bytes, True)
+                self.decoded.append(self.decoder.decode(raw_bytes, True))
                 break
             if self.strip_bom:
                 self.strip_bom = False
                 raw_bytes = raw_bytes[len(self.bom):]
-            self.decoded += self.decoder.decode(raw_bytes)
+            self.decoded.append(self.decoder.decode(raw_bytes))
             if size is None or len(self.decoded) >= size:
                 break
-        decoded = self.decoded[:size]
-        self.decoded = self.decoded[len(decoded):]
-        return decoded
+        return self.decoded.read(size)
 
     def pre_parse(self):
 
@@ -165,6 +415,7 @@ class HTMLStream(object):
         # parser will fail on non-ascii unless we set it explicitly
         parser = HTMLParser(target=target, encoding='ISO-8859-1')
         total_bytes = 0
+        sample = []
 
         self.response.seek(0)
         while target:
@@ -187,13 +438,94 @@ class HTMLStream(object):
                         break
 
             parser.feed(chunk)
+            sample.append(chunk)
             total_bytes += len(chunk)
             if total_bytes >= MAX_PRE_PARSE_BYTES:
                 break
 
+        self.sample = b''.join(sample)
         return target.encodings
 
 
+class Head(BytesIO):
+    """ The start of the content of a response (for pre-parsing). """
+
+    def __init__(self, data, headers, url):
+        BytesIO.__init__(self, data)
+        self.headers = headers
+        self.url = url
+
+
+class IncrementalParser(object):
+    """ Parses HTML as it is read rather than after it has all been read.
+
+    The encoding is chosen, just as :class:`HTMLStream` would choose it,
+    once the pre-parse window has been fed.  If the content turns out
+    not to be in that encoding then :attr:`root` is ``None`` and the
+    content should be parsed as usual.
+    """
+
+    def __init__(self, headers, url):
+        self.headers = headers
+        self.url = url
+        self.head = []
+        self.head_size = 0
+        self.stream = None
+        self.parser = None
+        self.dirty = ''
+        self.cdata_tag = None
+        self.failed = False
+        self.root = None
+
+    def feed(self, data):
+        if self.failed:
+            return
+        if self.stream is None:
+            self.head.append(data)
+            self.head_size += len(data)
+            if self.head_size < MAX_PRE_PARSE_BYTES:
+                return
+            data = self.start()
+        self.feed_bytes(data, False)
+
+    def close(self):
+        """ Finish parsing and return the root element (or ``None``). """
+        if not self.failed:
+            data = self.start() if self.stream is None else b''
+            self.feed_bytes(data, True)
+        if not self.failed:
+            try:
+                self.root = self.parser.close()
+            except LxmlError:
+                self.failed = True
+            else:
+                self.stream.record_encoding()
+        self.parser = None
+        return self.root
+
+    def start(self):
+        """ Choose the encoding and return the bytes fed so far. """
+        data = b''.join(self.head)
+        self.head = None
+        self.stream = HTMLStream(Head(data, self.headers, self.url))
+        if self.stream.bom:
+            data = data[len(self.stream.bom):]
+        # we feed the parser clean text encoded as utf-8
+        self.parser = HTMLParser(encoding='utf-8')
+        return data
+
+    def feed_bytes(self, data, eof):
+        try:
+            text = self.dirty + self.stream.decoder.decode(data, eof)
+            clean, self.dirty, self.cdata_tag = clean_ncr(text, eof,
+                                                          self.cdata_tag)
+            if clean:
+                self.parser.feed(clean.encode('utf-8'))
+        except (UnicodeDecodeError, LxmlError):
+            self.failed = True
+            self.parser = None
+
+
 class HTMLEncodings(object):
 
     def __init__(self, http_content_type):
@@ -1,10 +1,10 @@
 """ Helper functions for things that are iterable """
 
 import wex.py2compat ; assert wex.py2compat
-from itertools import chain, islice as islice_
+from itertools import islice as islice_
 from six import next, string_types
 from six.moves import map, filter
-from .composed import composable, wraps
+from .composed import Composable, composable, wraps
 
 
 class ZeroValuesError(ValueError):
@@ -19,17 +19,59 @@ class MultipleValuesError(ValueError):
 do_not_iter = tuple(string_types) + (dict, tuple)
 
 
-def _do_not_iter_append(typeobj):
+# should_iter functions whose answer depends only on the type of
+# their argument mapped to the answers found so far for each type.
+type_decisions = {}
+
+
+def do_not_iter_append(typeobj):
+    """ Registers a type whose instances should not be iterated.
+
+    Instances of `typeobj` (and its sub-classes) are treated as single
+    values rather than iterated by :func:`flatten` and by helpers like
+    :func:`map_if_iter` even if they have ``__iter__``.  Extractor
+    packages can use this (also as a class decorator) to register
+    their own types up front.
+    """
     # do_not_iter needs to be a tuple because we pass it to isinstance
     # but we want to append things so this makes it a little bit mutable
     global do_not_iter
     do_not_iter = do_not_iter + (typeobj,)
+    for decisions in type_decisions.values():
+        decisions.clear()
+    return typeobj
+
+
+_do_not_iter_append = do_not_iter_append
+
+
+def decided_by_type(func):
+    """ Remembers the answer of a `should_iter` function for each type.
+
+    `func` must depend only on the type of its argument.  The function
+    returned calls it once for each type (until the next call to
+    :func:`do_not_iter_append`) and :func:`flatten` looks up its answers
+    without calling it at all.
+    """
+    decisions = {}
+
+    @wraps(func)
+    def should_iter(obj):
+        iterate = decisions.get(type(obj))
+        if iterate is None:
+            iterate = decisions[type(obj)] = func(obj)
+        return iterate
 
+    type_decisions[should_iter] = decisions
+    return should_iter
 
+
+@decided_by_type
 def should_iter(obj):
     return hasattr(obj, '__iter__') and not isinstance(obj, do_not_iter)
 
 
+@decided_by_type
 def should_iter_list(obj):
     return hasattr(obj, '__iter__') and not isinstance(obj, do_not_iter + (list,))
 
@@ -67,24 +109,61 @@ def walk(obj, should_iter=should_iter):
 @composable
 def flatten(obj, should_iter=should_iter):
     """ Yield objects from all sub-iterables from obj. """
-    return chain.from_iterable(walk(obj, should_iter))
+    # if the answers are remembered we can look them up ourselves
+    iterate = type_decisions.get(should_iter, {}).get(type(obj))
+    if iterate is None:
+        iterate = should_iter(obj)
+    if not iterate:
+        return iter((obj,))
+    return flattened(iter(obj), should_iter)
 
 
 @composable
 def flatten_list(obj, should_iter=should_iter):
     """ Yield objects from all sub-iterables from obj. """
-    return chain.from_iterable(walk(obj, should_iter_list))
+    return flatten(obj, should_iter_list)
+
+
+def flattened(iterator, should_iter):
+    """ Yield objects from `iterator` and all of its sub-iterables.
+
+    Rather than a generator for each sub-iterable we keep a stack of
+    the iterators we are part way through.
+    """
+    # if the answers are remembered we can look them up ourselves
+    decisions = type_decisions.get(should_iter, {})
+    stack = []
+    while True:
+        for obj in iterator:
+            iterate = decisions.get(type(obj))
+            if iterate is None:
+                iterate = should_iter(obj)
+            if iterate:
+                stack.append(iterator)
+                iterator = iter(obj)
+                break
+            yield obj
+        else:
+            # iterator is now exhausted
+            if not stack:
+                return
+            iterator = stack.pop()
 
 
 def map_if_iter(func, should_iter=should_iter):
-    @composable
     @wraps(func)
     def _map_if_iter(arg):
         if should_iter(arg):
             return map(func, arg)
         else:
             return func(arg)
-    return _map_if_iter
+
+    def __inline__(self):
+        # see wex.composed.compile_functions
+        source = '{map}({func}, res) if {should_iter}(res) else {func}(res)'
+        return source, {'map': map, 'func': func, 'should_iter': should_iter}
+
+    return Composable.decorate(_map_if_iter, __inline__=__inline__)
 
 
 
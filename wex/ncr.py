@@ -1,4 +1,5 @@
 import re
+from .buffer import ChunkBuffer
 
 
 ncr_replacements = {
@@ -58,7 +59,7 @@ class InvalidNumCharRefReplacer(object):
 
     def __init__(self, fp):
         self.fp = fp
-        self.clean = ''
+        self.clean = ChunkBuffer()
         self.dirty = ''
         self.cdata_tag = None
 
@@ -70,99 +71,101 @@ class InvalidNumCharRefReplacer(object):
             clean, self.dirty, self.cdata_tag = clean_ncr(dirty,
                                                           eof,
                                                           self.cdata_tag)
-            self.clean += clean
+            self.clean.append(clean)
             if eof:
                 assert not self.dirty
-                data = self.clean
-                self.clean = ''
-                return data
-            elif len(self.clean) >= size:
-                data = self.clean[:size]
-                self.clean = self.clean[size:]
-                return data
+            if eof or len(self.clean) >= size:
+                return self.clean.read(size)
 
 
 def clean_ncr(dirty, eof, cdata_tag=None):
+    """ Returns `(clean, dirty, cdata_tag)` after cleaning `dirty`.
 
-    # We scan 'dirty' for incorrect numeric character references.
-    # As we scan, we append 'clean' sections to 'parts'.
-    parts = []
-    clean_start = clean_end = 0
+    If not `eof` the end of `dirty` may be part of a token that we
+    haven't seen all of yet, so that part is returned as `dirty` (to be
+    passed again with more data).  `cdata_tag` is the <script> or
+    <style> tag (if any) that we are inside at the start and end.
+    """
 
     assert not cdata_tag or cdata_tag == cdata_tag.lower().strip()
 
-    end_token = {
-        AMP: end_char_ref,
-        LT: end_tag,
-    }
+    end = len(dirty)
+    if not eof:
+        # tokens don't contain '<' or '&' (except at the start)
+        last = max(dirty.rfind(LT), dirty.rfind(AMP))
+        if last >= 0 and end - last <= MAX_TOKEN_SIZE:
+            end = last
+
+    hit = invalid_ncr.search(dirty, 0, end)
+    if not hit:
+        # The usual case: there is nothing to replace so all we need
+        # to know is whether we finish inside <script> or <style>.
+        cdata_tag = scan_cdata(dirty, 0, end, cdata_tag)
+        return dirty[:end], dirty[end:], cdata_tag
+
+    # We only need to look at tokens from the first invalid reference on.
+    cdata_tag = scan_cdata(dirty, 0, hit.start(), cdata_tag)
+    parts = []
+    clean_start = 0
+    for token in tokens.finditer(dirty, hit.start(), end):
+        if token.group('tag'):
+            cdata_tag = next_cdata_tag(token, cdata_tag)
+        elif not cdata_tag:
+            # ignore char refs inside <script> or <style> tags.
+            ncr = token.group('ncr')
+            if ncr.lower().startswith('x'):
+                code_point = int(ncr[1:], 16)
+            else:
+                code_point = int(ncr, 10)
+            parts.append(dirty[clean_start:token.start()])
+            parts.append('&#x%0X' % ncr_replacements[code_point])
+            clean_start = token.end()
+    parts.append(dirty[clean_start:end])
 
-    while True:
+    return ''.join(parts), dirty[end:], cdata_tag
 
-        if cdata_tag:
-            # ignore char refs inside <script> or <style> tags.
-            # just looking for </script> or </style>
-            begin_token = begin_tag
-        else:
-            begin_token = begin_tag_or_char_ref
-
-        begin = begin_token.search(dirty, clean_end)
-        if not begin:
-            # now we know there are not more tokens in this chunk
-            clean_end = len(dirty)
-            break
-
-        token = end_token[begin.group()].search(dirty, begin.end())
-        if not token:
-            # We haven't seen the end of this token yet,
-            # we may be called again, but with more data (if !eof).
-            break
-
-        if begin.group() == LT:
-            if token.group('slash') and cdata_tag:
-                tag = token.group('tag')
-                if tag and tag.lower() == cdata_tag:
-                    cdata_tag = None
-            elif not token.group('comment'):
-                tag = token.group('tag')
-                tag = tag and tag.lower()
-                if not cdata_tag and tag and tag in cdata_tags:
-                    cdata_tag = tag
-        else:
-            assert begin.group() == AMP
-            assert not cdata_tag
-
-            ncr = token.group(1)
-            if ncr:
-                if ncr.lower().startswith('x'):
-                    code_point = int(ncr[1:], 16)
-                else:
-                    code_point = int(ncr, 10)
-
-                if code_point in ncr_replacements:
-                    # append clean section
-                    parts.append(dirty[clean_start:begin.start()])
-                    ncr = '&#x%0X' % ncr_replacements[code_point]
-                    parts.append(ncr)
-                    # next clean section starts here
-                    clean_start = token.end()
-
-        # everything up to this position is now clean
-        clean_end = token.end()
-
-    if eof:
-        parts.append(dirty[clean_start:])
-    else:
-        parts.append(dirty[clean_start:clean_end])
-
-    return ''.join(parts), dirty[clean_end:], cdata_tag
-
-#
-# When scanning for the begining of tokens we look just one character
-# at a time so that we don't have to worry about partial buffering.
-begin_tag = re.compile(LT)
-begin_tag_or_char_ref = re.compile('[<&]', re.I)
-end_tag = re.compile('(?P<comment>!--)|(?P<slash>/?)\s*(?P<tag>[a-z]+)(?=[^a-z])', re.I)
-end_char_ref = re.compile('[^#]|#(x[0-9A-F]+|[0-9]+)', re.I)
+
+def scan_cdata(text, start, end, cdata_tag):
+    """ Returns the <script> or <style> tag we are inside at `end`. """
+    for token in cdata_tokens.finditer(text, start, end):
+        cdata_tag = next_cdata_tag(token, cdata_tag)
+    return cdata_tag
+
+
+def next_cdata_tag(token, cdata_tag):
+    tag = token.group('tag').lower()
+    if token.group('slash'):
+        return None if tag == cdata_tag else cdata_tag
+    return cdata_tag or tag
+
+
+# the longest token we expect (without lots of leading zeros or spaces)
+MAX_TOKEN_SIZE = 64
+
+# numeric character references to the code points in ncr_replacements
+invalid_ncr_pattern = (
+    '&#(?P<ncr>'
+    'x(?:0*(?:[89][0-9a-f]|d)|0+)(?![0-9a-f])|'
+    '(?:0*(?:12[89]|1[3-5][0-9]|13)|0+)(?![0-9])'
+    ')'
+)
+cdata_tag_pattern = r'<\s*(?P<slash>/?)\s*(?P<tag>script|style)(?![a-z])'
+
+invalid_ncr = re.compile(invalid_ncr_pattern, re.I)
+cdata_tokens = re.compile(cdata_tag_pattern, re.I)
+tokens = re.compile(invalid_ncr_pattern + '|' + cdata_tag_pattern, re.I)
+
+# invalid numeric character references in (undecoded) bytes
+invalid_ncr_bytes = re.compile(invalid_ncr_pattern.encode('ascii'), re.I)
+
+
+def has_invalid_ncr(data):
+    """ Returns ``True`` if bytes `data` may contain invalid NCRs.
+
+    This is a quick check that ignores <script> and <style> elements,
+    so it may find references that :func:`clean_ncr` would leave alone.
+    """
+    return invalid_ncr_bytes.search(data) is not None
 
 
 def replace_invalid_ncr(fp):
@@ -58,6 +58,8 @@ class StdOut(object):
     else:
         stdout = codecs.getwriter('utf-8')(sys.stdout)
 
+    empty = ''
+
     def __init__(self, readable):
         self.readable = readable
         self.buffer = []
@@ -75,7 +77,7 @@ class StdOut(object):
             self.readable.close()
 
     def flush(self):
-        chunk = ''.join(self.buffer)
+        chunk = self.empty.join(self.buffer)
         if chunk:
             with lock:
                 self.stdout.write(chunk)
@@ -90,6 +92,16 @@ class StdOut(object):
             self.flush()
 
 
+class BinaryStdOut(StdOut):
+    """ For :mod:`output formats <wex.formats>` that write bytes. """
+
+    if PY3:
+        stdout = sys.stdout.buffer
+    else:
+        stdout = sys.stdout
+
+    empty = b''
+
 
 class TeeStdOut(StdOut):
 
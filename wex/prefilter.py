@@ -0,0 +1,136 @@
+"""
+Filtering of readables using only their status line and headers.
+
+This lets the ``wex`` command drop responses (for example redirects,
+errors or images) before they are sent to other processes and before
+their content is read.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import logging
+from contextlib import closing
+from fnmatch import fnmatch
+from six import BytesIO
+from six.moves.urllib_parse import urlparse
+from .response import Response
+from .readable import Open, TeeReadable, ChainedReadable
+
+
+def host_matches(pattern, hostname):
+    """ Returns ``True`` if `hostname` matches `pattern`.
+
+    As for :mod:`entry points <wex.entrypoints>` a pattern starting with
+    ``.`` matches that domain name and any of its sub-domains.
+    Other patterns are matched using :func:`fnmatch.fnmatch`.
+    """
+    if not hostname:
+        return False
+    if pattern.startswith('.'):
+        return ('.' + hostname).endswith(pattern)
+    return fnmatch(hostname, pattern)
+
+
+def status_range(spec):
+    """ Returns an inclusive `(low, high)` pair from '200' or '200-299'. """
+    low, _, high = spec.partition('-')
+    low = int(low)
+    high = int(high) if high else low
+    if low > high:
+        raise ValueError("invalid status code range %r" % spec)
+    return low, high
+
+
+class HeadFilter(object):
+    """ Matches responses by host, status code and content type.
+
+    :param hosts: host patterns (see :func:`host_matches`)
+    :param status_ranges: inclusive ``(low, high)`` status code ranges
+    :param content_types: content type globs (e.g. ``text/*``)
+
+    A response matches if, for each of these that is not empty, it
+    matches at least one item.
+    """
+
+    def __init__(self, hosts=(), status_ranges=(), content_types=()):
+        self.hosts = list(hosts)
+        self.status_ranges = list(status_ranges)
+        self.content_types = list(content_types)
+
+    def __bool__(self):
+        return bool(self.hosts or self.status_ranges or self.content_types)
+
+    __nonzero__ = __bool__
+
+    def match(self, url, code, content_type):
+        if self.hosts:
+            hostname = urlparse(url or '').hostname
+            if not any(host_matches(p, hostname) for p in self.hosts):
+                return False
+        if self.status_ranges:
+            if not any(low <= code <= high
+                       for low, high in self.status_ranges):
+                return False
+        if self.content_types:
+            if not any(fnmatch(content_type, glob)
+                       for glob in self.content_types):
+                return False
+        return True
+
+    def match_readable(self, readable):
+        headers, kw = Response.head_from_readable(readable)
+        return self.match(kw['url'], kw['code'], headers.get_content_type())
+
+    def match_entry(self, entry):
+        """ Returns ``True`` if a :mod:`tar index <wex.tarindex>` entry
+        matches or if its head couldn't be read. """
+        if entry['code'] is None:
+            # errors are best reported when extracting
+            return True
+        return self.match(entry['url'], entry['code'], entry['content_type'])
+
+
+def filter_readables(readables, head_filter):
+    """ Yield the readables whose status line and headers match. """
+
+    for readable in readables:
+
+        if getattr(readable, 'prefiltered', False):
+            # already matched using a tar index
+            yield readable
+            continue
+
+        if isinstance(readable, Open):
+            # Read the head using a separate file object so
+            # that `readable` can still be sent to other processes.
+            try:
+                fp = readable.open()
+            except EnvironmentError:
+                # errors are best reported when extracting
+                yield readable
+                continue
+            with closing(fp):
+                matched = head_matches(head_filter, fp)
+            if matched:
+                yield readable
+            continue
+
+        # Keep what we read so we can put it back in front.
+        head = BytesIO()
+        matched = head_matches(head_filter, TeeReadable(readable, head))
+        head.seek(0)
+        readable = ChainedReadable(head, readable)
+        if matched:
+            yield readable
+        else:
+            readable.close()
+
+
+def head_matches(head_filter, readable):
+    """ Returns ``True`` if the head matches or if it can't be read. """
+    try:
+        return head_filter.match_readable(readable)
+    except Exception:
+        # errors are best reported when extracting
+        logger = logging.getLogger(__name__)
+        logger.debug("unable to filter %r", readable, exc_info=True)
+        return True
@@ -1,6 +1,8 @@
 """Wrapper around multiprocessing.Pool to perform extraction"""
 
 import logging
+from time import time
+from itertools import islice
 from six.moves import map
 from functools import wraps
 from contextlib import contextmanager
@@ -93,12 +95,84 @@ def yield_exc(iterable):
         yield exc
 
 
-def do_in_pool(worklist, pool_size, initializer, initargs):
+#: Aim for each chunk of work sent to the pool to take about this long.
+TARGET_CHUNK_SECONDS = 0.1
+
+#: Never send more than this many items to a worker in one go.
+MAX_CHUNK_SIZE = 256
+
+
+class ChunkSizer(object):
+    """\
+    Sizes chunks of work from the measured time taken per item.
+
+    Sending items to the pool one at a time means that each item
+    costs a pickle and an IPC round trip.  For small items that
+    overhead can be more than the work itself, so we batch them.
+    But batching too much means workers sit idle at the end of
+    a run, so we aim for chunks that take `target` seconds.
+
+    If `chunksize` is given then the size is fixed.
+    """
+
+    #: weight given to the latest measurement of time per item
+    alpha = 0.25
+
+    def __init__(self, chunksize=None, target=TARGET_CHUNK_SECONDS,
+                 maximum=MAX_CHUNK_SIZE):
+        self.fixed = chunksize is not None
+        self.size = chunksize or 1
+        self.target = target
+        self.maximum = maximum
+        self.seconds_per_item = None
+
+    def update(self, count, seconds):
+        if self.fixed or count < 1:
+            return
+        seconds_per_item = seconds / count
+        if self.seconds_per_item is None:
+            self.seconds_per_item = seconds_per_item
+        else:
+            self.seconds_per_item += (self.alpha *
+                                      (seconds_per_item -
+                                       self.seconds_per_item))
+        if self.seconds_per_item > 0:
+            size = int(self.target / self.seconds_per_item)
+        else:
+            size = self.maximum
+        self.size = max(1, min(size, self.maximum))
+
+
+def chunks(func, iterable, sizer):
+    """ Yield (func, items) pairs with items chunked using `sizer`. """
+    iterator = iter(iterable)
+    while True:
+        items = list(islice(iterator, sizer.size))
+        if not items:
+            break
+        yield func, items
+
+
+def do_chunk(func_items):
+    """ Do a chunk of work in a worker returning results and timing. """
+    func, items = func_items
+    start = time()
+    results = [func(item) for item in items]
+    return results, time() - start
+
+
+def do_in_pool(worklist, pool_size, initializer, initargs, chunksize=None):
+    # The same pool (and so the same worker processes) is used for every
+    # round of work, including any work added by `MoreWork`.
+    sizer = ChunkSizer(chunksize)
     with close_and_shutdown(Pool(pool_size, initializer, initargs)) as pool:
         while worklist:
             func, iterable = worklist.pop()
-            for exc_or_none in pool.imap_unordered(func, yield_exc(iterable)):
-                yield exc_or_none
+            work = chunks(func, yield_exc(iterable), sizer)
+            for results, seconds in pool.imap_unordered(do_chunk, work):
+                sizer.update(len(results), seconds)
+                for exc_or_none in results:
+                    yield exc_or_none
 
 
 # Special handling for single process "pool".
@@ -111,12 +185,20 @@ def do_in_this_process(work, initializer, initargs):
             yield exc
 
 
-def do(func, iterable, pool_size=None, initializer=None, initargs=()):
-    """ Send work to the pool. """
+def do(func, iterable, pool_size=None, initializer=None, initargs=(),
+       chunksize=None):
+    """\
+    Send work to the pool.
+
+    Work is sent to the pool in chunks.  If `chunksize` is ``None`` the
+    size of each chunk adapts to how long items take to process,
+    otherwise it is fixed at `chunksize` items.
+    """
     worklist = [(func, iterable)]
 
     if pool_size != 1:
-        results = do_in_pool(worklist, pool_size, initializer, initargs)
+        results = do_in_pool(worklist, pool_size, initializer, initargs,
+                             chunksize)
     else:
         # This is especially useful for debugging
         results = do_in_this_process(worklist, initializer, initargs)
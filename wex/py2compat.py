@@ -22,6 +22,10 @@ if six.PY2:
         return self.getparam('charset')
     HTTPMessage.get_content_charset = get_content_charset
 
+    def get_content_type(self):
+        return self.gettype()
+    HTTPMessage.get_content_type = get_content_type
+
     def parse_headers(fp):
         return HTTPMessage(fp, 0)
 
@@ -10,7 +10,7 @@ import os
 import errno
 import sys
 import tarfile
-from io import FileIO
+from io import FileIO, BufferedReader, open as io_open
 from threading import local
 from functools import partial as partial_
 from contextlib import closing
@@ -46,10 +46,14 @@ class Open(object):
         return 'Open(%r)' % self.open
 
     def __getattr__(self, name):
-        if name not in ('readline', 'read', 'close', 'name'):
+        if name not in ('readline', 'read', 'close', 'name', 'opened'):
+            raise AttributeError
+        if 'opened' in self.__dict__:
+            # already open and the attribute is missing
             raise AttributeError
         fp = self.open()
 
+        self.__dict__['opened'] = fp
         self.__dict__['read'] = fp.read
         self.__dict__['readline'] = fp.readline
         self.__dict__['close'] = fp.close
@@ -84,8 +88,17 @@ def tarfile_tarinfo_open(path, tarinfo):
     return tf.extractfile(tarinfo)
 
 
-def readables_from_paths(paths, save_dir=None):
-    """ Yield readables from a sequence of paths """
+def file_section_open(path, offset, size):
+    return FileSection(io_open(path, 'rb'), offset, size)
+
+
+def readables_from_paths(paths, save_dir=None, use_index=False,
+                         head_filter=None):
+    """ Yield readables from a sequence of paths
+
+    If `head_filter` is given, members of indexed tar files that don't
+    match it are skipped and those that do are marked as ``prefiltered``.
+    """
 
     for path in paths:
         if path.strip() == b'-':
@@ -102,7 +115,8 @@ def readables_from_paths(paths, save_dir=None):
             for readable in readables:
                 yield readable
         else:
-            for readable in readables_from_file_path(path):
+            for readable in readables_from_file_path(path, use_index,
+                                                     head_filter):
                 yield readable
 
 
@@ -117,9 +131,12 @@ def save_readables(url, save_dir, readables):
             yield readable
 
 
-def readables_from_file_path(path):
+def readables_from_file_path(path, use_index=False, head_filter=None):
     """ Yield readables from a file system path """
 
+    # avoid a circular import
+    from .warc import is_warc_path, readables_from_warc
+
     numdirs = 0
     for dirpath, dirnames, filenames in os.walk(path):
         numdirs += 1
@@ -129,14 +146,22 @@ def readables_from_file_path(path):
             if filename.lower().endswith(EXT_WEXIN):
                 filepath = os.path.join(dirpath, filename)
                 yield Open(partial(FileIO, filepath))
+            elif is_warc_path(filename):
+                filepath = os.path.join(dirpath, filename)
+                for readable in readables_from_warc(filepath):
+                    yield readable
 
     if numdirs < 1:
         if path.lower().endswith('EXT_WEXIN'):
             yield Open(partial(FileIO, path))
+        elif is_warc_path(path) and os.path.exists(path):
+            for readable in readables_from_warc(path):
+                yield readable
         else:
             try:
                 tf = tarfile_open(path)
-                for readable in readables_from_tarfile(tf):
+                for readable in readables_from_tarfile(tf, use_index,
+                                                       head_filter):
                     yield readable
             except IOError as exc:
                 if exc.errno != errno.ENOENT:
@@ -148,10 +173,39 @@ def readables_from_file_path(path):
                 yield Open(partial(FileIO, path))
 
 
-def readables_from_tarfile(tf):
+def tarfile_is_seekable(tf):
+    """ Returns ``True`` if members can be read from their data offset. """
+    return isinstance(tf.fileobj, (BufferedReader, FileIO))
+
+
+def readables_from_tarfile(tf, use_index=False, head_filter=None):
+    # The members of an uncompressed tar file can be read directly
+    # from their data offset, so that each process can open and seek
+    # without going through (and re-opening) a shared TarFile object.
+    # Consecutive members are contiguous ranges of the file so chunks
+    # of work sent to the pool end up reading contiguous byte ranges.
+    seekable = tarfile_is_seekable(tf)
+
+    if seekable and use_index:
+        # avoid a circular import
+        from .tarindex import tar_index
+        for entry in tar_index(tf, EXT_WEXIN):
+            if head_filter and not head_filter.match_entry(entry):
+                continue
+            readable = Open(partial(file_section_open, tf.name,
+                                    entry['offset'], entry['size']))
+            # so that `filter_readables` doesn't read the head again
+            readable.prefiltered = bool(head_filter)
+            yield readable
+        return
+
     for ti in tf:
         if ti.name.endswith(EXT_WEXIN):
-            yield Open(partial(tarfile_tarinfo_open, tf.name, ti))
+            if seekable and ti.isreg() and not ti.issparse():
+                yield Open(partial(file_section_open, tf.name,
+                                   ti.offset_data, ti.size))
+            else:
+                yield Open(partial(tarfile_tarinfo_open, tf.name, ti))
 
 
 class TeeReadable(object):
@@ -189,6 +243,44 @@ class TeeReadable(object):
         self.tee.close()
 
 
+class FileSection(object):
+    """ Readable for `size` bytes of a file starting at `offset`. """
+
+    def __init__(self, fileobj, offset, size):
+        self.fileobj = fileobj
+        self.fileobj.seek(offset)
+        self.remaining = size
+        self.end = offset + size
+
+    @property
+    def name(self):
+        return self.fileobj.name
+
+    def fileno(self):
+        return self.fileobj.fileno()
+
+    def tell(self):
+        return self.fileobj.tell()
+
+    def _limit(self, size):
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining
+        return size
+
+    def read(self, size=-1):
+        buf = self.fileobj.read(self._limit(size))
+        self.remaining -= len(buf)
+        return buf
+
+    def readline(self, limit=-1):
+        buf = self.fileobj.readline(self._limit(limit))
+        self.remaining -= len(buf)
+        return buf
+
+    def close(self):
+        self.fileobj.close()
+
+
 class ChainedReadable(object):
     """ Readable that combines the contents of multiple filelike together """
 
@@ -1,16 +1,22 @@
 from __future__ import unicode_literals, print_function, absolute_import
 import os
+import mmap
 import itertools
 import logging
+from io import FileIO
 from tempfile import SpooledTemporaryFile as SpooledTemporaryFile_
 from shutil import copyfileobj
+from functools import partial
 from six import PY2, next
 from six.moves.urllib.response import addinfourl
+from six.moves.urllib_parse import urlparse
 from six.moves.http_client import BadStatusLine as _BadStatusLine
 from .py2compat import parse_headers
 from .cache import Cache
 from .value import yield_values
 from .iterable import _do_not_iter_append
+from .readable import FileSection
+from .htmlstream import IncrementalParser
 
 
 DEFAULT_READ_SIZE = 2**16  # 64K
@@ -42,6 +48,17 @@ class Response(addinfourl):
     #: to uniquely identify each response object.
     response_ids = itertools.count(1)
 
+    #: If true, content read from a file on disk is memory mapped
+    #: rather than copied into a temporary file.
+    mmap_content = False
+
+    #: Accounts for (and limits) content held in memory by this process.
+    spool_budget = None
+
+    #: If true, HTML content read from a network connection or a pipe
+    #: is parsed as it is read (see :attr:`incremental_parser`).
+    parse_incrementally = False
+
     def __init__(self, content, headers, url, code=None, **kw):
         addinfourl.__init__(self, content, headers, url, code)
         self.id = next(self.response_ids)
@@ -49,13 +66,23 @@ class Response(addinfourl):
         self.protocol = kw.pop('protocol', None)
         self.version = kw.pop('version', None)
         self.reason = kw.pop('reason', None)
-        self.magic_bytes = kw.pop('magic_bytes', None)
+        self._magic_bytes = kw.pop('magic_bytes', None)
         self.warc_protocol = kw.pop('warc_protocol', None)
         self.warc_version = kw.pop('warc_version', None)
         self.warc_headers = kw.pop('warc_headers', None)
+        #: A :class:`wex.htmlstream.IncrementalParser` fed as the
+        #: content is read (or ``None``).
+        self.incremental_parser = kw.pop('incremental_parser', None)
         if kw:
             raise ValueError("unexpected keyword arguments %r" % kw.keys())
 
+    @property
+    def magic_bytes(self):
+        """ The first few bytes of the content. """
+        if self._magic_bytes is None and isinstance(self.fp, LazyContent):
+            self._magic_bytes = self.fp.magic_bytes
+        return self._magic_bytes
+
     def seek(self, offset=0, whence=0):
         """ Seek the content file position.
 
@@ -68,14 +95,48 @@ class Response(addinfourl):
     @classmethod
     def values_from_readable(cls, extractor, readable, label_funcs=()):
         response = cls.from_readable(readable)
-        with Cache():
-            labels = [func(response) for func in label_funcs]
-            for value in yield_values(extractor, response):
-                value = value.label(*labels)
-                yield value
+        try:
+            host = urlparse(response.url or '').hostname
+            with Cache(host=host):
+                labels = [func(response) for func in label_funcs]
+                for value in yield_values(extractor, response):
+                    value = value.label(*labels)
+                    yield value
+        finally:
+            # release the content (and its share of the spool budget)
+            response.close()
 
     @classmethod
     def from_readable(cls, readable):
+        headers, kw = cls.head_from_readable(readable)
+        url = kw.pop('url')
+        code = kw.pop('code')
+        parser = None
+        if (cls.parse_incrementally and is_stream(readable) and
+                headers.get_content_type() == 'text/html' and
+                not headers.get('content-encoding')):
+            parser = IncrementalParser(headers, url)
+        # The content is only read from `readable` if it gets used, so
+        # responses nothing wants to extract from are cheap to skip.
+        # This means `readable` must stay open until the content is read.
+        content = LazyContent(partial(cls.content_file, readable, headers,
+                                      parser))
+        return Response(content,
+                        headers,
+                        url,
+                        code=code,
+                        incremental_parser=parser,
+                        **kw)
+
+    @classmethod
+    def head_from_readable(cls, readable):
+        """ Read the status line(s) and headers from `readable`.
+
+        This leaves `readable` positioned at the start of the content
+        and returns a ``(headers, kw)`` pair where `kw` holds the
+        ``url``, ``code`` and the other keyword arguments for
+        constructing a :class:`.Response`.
+        """
 
         status_line = readable.readline()
 
@@ -118,19 +179,15 @@ class Response(addinfourl):
                     log.warning("undecodable url %r", url)
                     url = url.decode('iso-8859-1')
 
-        magic_bytes, content = cls.content_file(readable, headers)
-        return Response(content,
-                        headers,
-                        url,
-                        code=code,
-                        protocol=protocol.decode('utf-8'),
-                        version=version,
-                        reason=reason.decode('utf-8'),
-                        request_url=request_url,
-                        magic_bytes=magic_bytes,
-                        warc_protocol=warc_protocol,
-                        warc_version=warc_version,
-                        warc_headers=warc_headers)
+        return headers, dict(url=url,
+                             code=code,
+                             protocol=protocol.decode('utf-8'),
+                             version=version,
+                             reason=reason.decode('utf-8'),
+                             request_url=request_url,
+                             warc_protocol=warc_protocol,
+                             warc_version=warc_version,
+                             warc_headers=warc_headers)
 
     @staticmethod
     def parse_warc_version(readable, status_line):
@@ -165,19 +222,239 @@ class Response(addinfourl):
         return protocol, version, code, reason
 
     @classmethod
-    def content_file(cls, response_file, headers):
-        content_file = SpooledTemporaryFile(max_size=MAX_IN_MEMORY_SIZE)
+    def content_file(cls, response_file, headers, parser=None):
+        if cls.mmap_content and parser is None:
+            content_file = mapped_file(response_file)
+            if content_file is not None:
+                magic_bytes = content_file.read(MAGIC_BYTES_LEN)
+                content_file.seek(0)
+                return magic_bytes, content_file
+        if cls.spool_budget is None:
+            cls.spool_budget = SpoolBudget()
+        content_file = SpooledTemporaryFile(max_size=MAX_IN_MEMORY_SIZE,
+                                            budget=cls.spool_budget)
         magic_bytes = response_file.read(MAGIC_BYTES_LEN)
         content_file.write(magic_bytes)
-        copyfileobj(response_file, content_file)
+        if parser is None:
+            copyfileobj(response_file, content_file)
+        else:
+            parser.feed(magic_bytes)
+            read = partial(response_file.read, DEFAULT_READ_SIZE)
+            for buf in iter(read, b''):
+                content_file.write(buf)
+                parser.feed(buf)
+            parser.close()
         content_file.seek(0)
         return magic_bytes, content_file
 
 
+class LazyContent(object):
+    """ Content that is read, using `content_file`, when it is first used.
+
+    `content_file` must return a ``(magic_bytes, fileobj)`` pair.
+    """
+
+    def __init__(self, content_file):
+        self.content_file = content_file
+        self._magic_bytes = None
+        self._file = None
+        self._closed = False
+
+    @property
+    def file(self):
+        if self._file is None:
+            if self._closed:
+                raise ValueError("I/O operation on closed file")
+            self._magic_bytes, self._file = self.content_file()
+            self.content_file = None
+        return self._file
+
+    @property
+    def magic_bytes(self):
+        self.file
+        return self._magic_bytes
+
+    @property
+    def closed(self):
+        if self._file is None:
+            return self._closed
+        return self._file.closed
+
+    def close(self):
+        if self._file is None:
+            # no need to read content just to close it
+            self._closed = True
+            self.content_file = None
+        else:
+            self._file.close()
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __getattr__(self, name):
+        # copy and pickle look for special methods on objects that
+        # haven't been initialised, so don't read the content for those
+        if name.startswith('__') or '_file' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.file, name)
+
+
+class SpoolBudget(object):
+    """ Accounts for response content held in memory by this process.
+
+    Content is spooled to a temporary file (in `dir`) rather than held
+    in memory once this process holds more than `limit` bytes of
+    content in memory.  With no `limit` only the size of each
+    individual response is limited (by :data:`MAX_IN_MEMORY_SIZE`).
+    """
+
+    def __init__(self, limit=None, dir=None):
+        self.limit = limit
+        self.dir = dir
+        self.in_memory = 0
+        self.spills = 0
+        self.spilled_bytes = 0
+
+    def reserve(self, size):
+        """ Returns ``True`` if `size` more bytes can be held in memory. """
+        if self.limit is not None and self.in_memory + size > self.limit:
+            return False
+        self.in_memory += size
+        return True
+
+    def release(self, size):
+        self.in_memory -= size
+
+    def spilled(self, size):
+        self.spills += 1
+        self.spilled_bytes += size
+
+    def log_stats(self):
+        if not self.spills:
+            return
+        logger = logging.getLogger(__name__)
+        logger.info("process %d spooled %d responses (%d bytes) to disk",
+                    os.getpid(), self.spills, self.spilled_bytes)
+
+
 class SpooledTemporaryFile(SpooledTemporaryFile_):
+
+    def __init__(self, max_size=0, budget=None):
+        self.budget = budget if budget is not None else SpoolBudget()
+        self.reserved = 0
+        SpooledTemporaryFile_.__init__(self, max_size=max_size,
+                                       dir=self.budget.dir)
+
     def read(self, size=None):
         return self._file.read() if size is None else self._file.read(size)
 
+    def write(self, s):
+        if self._rolled:
+            self.budget.spilled_bytes += len(s)
+        elif self.budget.reserve(len(s)):
+            self.reserved += len(s)
+        else:
+            self.rollover()
+            self.budget.spilled_bytes += len(s)
+        return SpooledTemporaryFile_.write(self, s)
+
+    def rollover(self):
+        if self._rolled:
+            return
+        pos = self._file.tell()
+        # cStringIO's seek returns None so use tell for the size
+        self._file.seek(0, 2)
+        size = self._file.tell()
+        self._file.seek(pos)
+        SpooledTemporaryFile_.rollover(self)
+        self.budget.release(self.reserved)
+        self.budget.spilled(size)
+        self.reserved = 0
+
+    def close(self):
+        self.budget.release(self.reserved)
+        self.reserved = 0
+        SpooledTemporaryFile_.close(self)
+
+
+class MappedFile(object):
+    """ A read-only file of the bytes from `start` to `end` of a file.
+
+    The bytes are memory mapped so nothing is copied until it is read.
+    """
+
+    def __init__(self, fileno, start, end):
+        # mmap offsets must be a multiple of ALLOCATIONGRANULARITY
+        offset = start - start % mmap.ALLOCATIONGRANULARITY
+        self.mmap = mmap.mmap(fileno, end - offset, offset=offset,
+                              access=mmap.ACCESS_READ)
+        self.start = self.pos = start - offset
+        self.end = end - offset
+
+    @property
+    def closed(self):
+        return self.mmap.closed
+
+    def read(self, size=-1):
+        stop = self.end
+        if size is not None and size >= 0:
+            stop = min(stop, self.pos + size)
+        buf = self.mmap[self.pos:stop]
+        self.pos += len(buf)
+        return buf
+
+    def readline(self, size=-1):
+        stop = self.mmap.find(b'\n', self.pos, self.end)
+        stop = self.end if stop < 0 else stop + 1
+        if size is not None and size >= 0:
+            stop = min(stop, self.pos + size)
+        return self.read(max(stop - self.pos, 0))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def seek(self, offset, whence=0):
+        base = (self.start, self.pos, self.end)[whence]
+        self.pos = max(base + offset, self.start)
+        return self.pos - self.start
+
+    def tell(self):
+        return self.pos - self.start
+
+    def close(self):
+        self.mmap.close()
+
+
+def is_stream(readable):
+    """ Returns ``True`` unless `readable` reads from a seekable file. """
+    fp = getattr(readable, 'opened', readable)
+    if isinstance(fp, FileSection):
+        return False
+    seekable = getattr(fp, 'seekable', None)
+    return not (seekable is not None and seekable())
+
+
+def mapped_file(readable):
+    """ Returns a :class:`MappedFile` for the rest of `readable`.
+
+    ``None`` is returned unless `readable` reads directly from a file.
+    """
+    fp = getattr(readable, 'opened', readable)
+    if isinstance(fp, FileSection):
+        end = fp.end
+    elif isinstance(fp, FileIO):
+        end = os.fstat(fp.fileno()).st_size
+    else:
+        return None
+    start = fp.tell()
+    if end <= start:
+        # can't mmap zero bytes
+        return None
+    try:
+        return MappedFile(fp.fileno(), start, end)
+    except (EnvironmentError, ValueError):
+        return None
+
 
 def id(response):
     """ Returns a generated id for the current response object.
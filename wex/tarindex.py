@@ -0,0 +1,117 @@
+"""
+Index files for tar files of ``.wexin`` members.
+
+Finding the ``.wexin`` members of a tar file means reading every
+member header in the tar file.  For large tar files this can take a
+long time, so the result can be saved in an index file next to the
+tar file (with the extension ``.wexidx``).  Later runs use the index,
+as long as the tar file has not changed, instead of reading the tar
+file again.
+
+Each member in the index has its name, data offset and size together
+with the URL, status code and content type read from the stored
+response headers, so that the ``--host``, ``--status`` and
+``--content-type`` arguments to ``wex`` can select members without
+reading them.
+
+Index files are only created for uncompressed tar files because
+only those members can be read directly from their data offset.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import io
+import json
+import errno
+import logging
+from .response import Response
+from .readable import FileSection, tarfile_is_seekable
+
+
+EXT_WEXIDX = '.wexidx'
+
+#: Bump this if the index file format changes
+INDEX_VERSION = 2
+
+
+def index_path(path):
+    return path + EXT_WEXIDX
+
+
+def archive_stat(path):
+    st = os.stat(path)
+    return {'version': INDEX_VERSION, 'size': st.st_size,
+            'mtime': st.st_mtime}
+
+
+def head_entry(fileobj, tarinfo):
+    """ Returns url, status code and content type from the member's
+    stored response. """
+    section = FileSection(fileobj, tarinfo.offset_data, tarinfo.size)
+    try:
+        headers, kw = Response.head_from_readable(section)
+    except Exception:
+        # we can't tell from here, so leave it for extraction to find out
+        return None, None, None
+    return kw['url'], kw['code'], headers.get_content_type()
+
+
+def index_entries(tf, ext):
+    """ Yield index entries for the members of `tf` ending in `ext`. """
+    with io.open(tf.name, 'rb') as fileobj:
+        for ti in tf:
+            if not ti.name.endswith(ext):
+                continue
+            if not ti.isreg() or ti.issparse():
+                continue
+            url, code, content_type = head_entry(fileobj, ti)
+            yield {
+                'name': ti.name,
+                'offset': ti.offset_data,
+                'size': ti.size,
+                'url': url,
+                'code': code,
+                'content_type': content_type,
+            }
+
+
+def load_index(path):
+    """ Returns the index entries for `path` or ``None`` if out of date. """
+    try:
+        with io.open(index_path(path), 'r', encoding='utf-8') as fp:
+            lines = iter(fp)
+            if json.loads(next(lines)) != archive_stat(path):
+                return None
+            return [json.loads(line) for line in lines]
+    except (IOError, OSError, ValueError, StopIteration):
+        return None
+
+
+def save_index(path, entries, stat):
+    """ Write the index for `path` (if the directory is writable). """
+    tmp = index_path(path) + '.tmp'
+    try:
+        with io.open(tmp, 'w', encoding='utf-8') as fp:
+            for obj in [stat] + entries:
+                fp.write(json.dumps(obj, sort_keys=True) + '\n')
+        os.rename(tmp, index_path(path))
+    except (IOError, OSError) as exc:
+        if exc.errno not in (errno.EACCES, errno.EROFS, errno.EPERM):
+            raise
+        logger = logging.getLogger(__name__)
+        logger.debug("unable to save index for %s (%s)", path, exc)
+
+
+def tar_index(tf, ext):
+    """ Returns index entries for `tf` loading or building as needed.
+
+    ``None`` is returned if `tf` is not seekable.
+    """
+    if not tarfile_is_seekable(tf):
+        return None
+    entries = load_index(tf.name)
+    if entries is None:
+        stat = archive_stat(tf.name)
+        entries = list(index_entries(tf, ext))
+        save_index(tf.name, entries, stat)
+    return entries
@@ -0,0 +1,140 @@
+"""
+A cache, on disk, of parsed HTML documents.
+
+When the same responses are extracted from again and again (for
+example while developing extractors) most of the time can be spent
+decoding and parsing the same HTML.  A :class:`TreeCache` saves each
+parsed document as compressed XML, which lxml can load more quickly
+than it can parse the HTML.
+
+Documents are keyed by a hash of their content and content type
+together with the versions of wex and lxml, so a new version of either
+simply stops using the old entries.  The cache is never cleaned up; to
+clear it remove its directory.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import io
+import zlib
+import errno
+import hashlib
+import logging
+from six import BytesIO
+from six.moves import zip_longest
+from lxml.etree import (parse as parse_xml, tostring, LxmlError,
+                        LXML_VERSION, LIBXML_VERSION)
+from lxml.html import XHTMLParser
+from . import __version__
+
+
+#: Bump this if the format of the cached documents changes
+TREE_CACHE_VERSION = 1
+
+EXT_TREE = '.xml.z'
+
+READ_SIZE = 2**16
+
+# we want fast rather than small
+COMPRESS_LEVEL = 1
+
+
+def settings():
+    """ Returns what, apart from its content, a parsed document depends on. """
+    return [str(TREE_CACHE_VERSION), __version__,
+            '.'.join(map(str, LXML_VERSION)),
+            '.'.join(map(str, LIBXML_VERSION))]
+
+
+def xml_parser():
+    # XHTMLParser creates the same element classes as lxml.html.HTMLParser
+    return XHTMLParser(huge_tree=True, resolve_entities=False)
+
+
+def same_tree(tree, loaded):
+    """ Returns ``True`` if `loaded` has the same nodes as `tree`.
+
+    Some documents load differently from XML than they were parsed from
+    HTML (for example an ``xmlns`` attribute puts elements in a
+    namespace) and extracting from those would give different results.
+    """
+    pairs = zip_longest(tree.getroot().iter(), loaded.getroot().iter())
+    for node, loaded_node in pairs:
+        if node is None or loaded_node is None:
+            return False
+        if (node.tag != loaded_node.tag or
+                node.attrib != loaded_node.attrib or
+                node.text != loaded_node.text or
+                node.tail != loaded_node.tail):
+            return False
+    return True
+
+
+class TreeCache(object):
+    """ Parsed documents saved in the directory `dir`. """
+
+    def __init__(self, dir):
+        self.dir = dir
+
+    def key(self, fp, content_type=''):
+        """ Returns the key for the content of `fp` (read to the end). """
+        digest = hashlib.sha1()
+        for setting in settings() + [content_type]:
+            digest.update(setting.encode('utf-8') + b'\0')
+        for buf in iter(lambda: fp.read(READ_SIZE), b''):
+            digest.update(buf)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.dir, key[:2], key + EXT_TREE)
+
+    def load(self, key):
+        """ Returns the saved tree for `key` or ``None``. """
+        try:
+            with io.open(self.path(key), 'rb') as fp:
+                data = fp.read()
+        except (IOError, OSError):
+            return None
+        if not data:
+            # we found this one couldn't be saved
+            return None
+        try:
+            return parse_xml(BytesIO(zlib.decompress(data)), xml_parser())
+        except (zlib.error, LxmlError):
+            logger = logging.getLogger(__name__)
+            logger.warning("unable to load %s", self.path(key))
+            return None
+
+    def save(self, key, tree):
+        """ Save `tree` for `key` (unless it has been saved already). """
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        xml = tostring(tree, encoding='utf-8')
+        try:
+            # not every HTML document is well-formed XML once parsed
+            same = same_tree(tree, parse_xml(BytesIO(xml), xml_parser()))
+        except LxmlError:
+            same = False
+        if same:
+            data = zlib.compress(xml, COMPRESS_LEVEL)
+        else:
+            # an empty file stops us trying again
+            data = b''
+        # other processes may be saving too so use our own temporary file
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            with io.open(tmp, 'wb') as fp:
+                fp.write(data)
+            os.rename(tmp, path)
+        except (IOError, OSError) as exc:
+            if exc.errno not in (errno.EACCES, errno.EROFS, errno.EPERM,
+                                 errno.ENOSPC):
+                raise
+            logger = logging.getLogger(__name__)
+            logger.debug("unable to save %s (%s)", path, exc)
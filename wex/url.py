@@ -18,6 +18,7 @@ from publicsuffix import PublicSuffixList
 
 from .py2compat import urlquote
 from .composed import composable
+from .cache import cached
 from .iterable import map_if_iter
 from .value import encode_json
 
@@ -210,4 +211,9 @@ strip_url_query = filter_url_query()
 @composable
 @map_if_iter
 def public_suffix(src):
-    return public_suffix_list.get_public_suffix(url_hostname(src) or src)
+    return public_suffix_of(url_hostname(src) or src)
+
+
+@cached(scope='process')
+def public_suffix_of(hostname):
+    return public_suffix_list.get_public_suffix(hostname)
@@ -29,7 +29,8 @@ from operator import itemgetter
 from bdb import BdbQuit
 from six import PY2, binary_type, text_type, reraise
 from six.moves import map
-from .iterable import walk, flatten, do_not_iter
+from . import iterable
+from .iterable import flatten, decided_by_type
 
 logger = logging.getLogger(__name__)
 
@@ -51,7 +52,34 @@ if PY2:
 encode_json = json.JSONEncoder(**json_encoder_kwargs).encode
 
 
+INFINITY = float('inf')
+
+
+def encode_float(obj):
+    if obj != obj or obj in (INFINITY, -INFINITY):
+        # JSON has no representation for these
+        return encode_json(obj)
+    return float.__repr__(obj)
+
+
+#: Encoders, by exact type, that give the same result as ``encode_json``
+#: without going through :class:`json.JSONEncoder`.
+fast_encoders = {
+    type(None): lambda obj: 'null',
+    bool: lambda obj: 'true' if obj else 'false',
+    int: int.__repr__,
+    float: encode_float,
+}
+
+
+if not PY2:
+    fast_encoders[text_type] = json.encoder.encode_basestring
+
+
 def encode_field(obj):
+    encode = fast_encoders.get(type(obj))
+    if encode is not None:
+        return encode(obj)
     try:
         s = encode_json(obj)
         if isinstance(s, binary_type):
@@ -61,10 +89,11 @@ def encode_field(obj):
         return '#' + text_type(repr(obj)) + '!'
 
 
+@decided_by_type
 def should_iter_unless_list(obj):
     # a list is a reasonable value type so don't flatten it
     return (hasattr(obj, '__iter__') and
-            not isinstance(obj, do_not_iter + (list,)))
+            not isinstance(obj, iterable.do_not_iter + (list,)))
 
 
 class Value(tuple):
@@ -82,27 +111,83 @@ class Value(tuple):
 
     def text(self):
         """ Returns the text this value as a labelled JSON line. """
-        iterables = [map(encode_field, flatten(label))
-                     for label in self.labels]
-        flattened = flatten(self.value, should_iter_unless_list)
-        iterables.append(map(encode_field, flattened))
-        for fields in product(*iterables):
-            yield TAB.join(fields) + NL
+        lines = []
+        TextEncoder().write(self, lines.append)
+        for line in lines:
+            yield line
 
     def label(self, *labels):
         """ Adds zero or more labels to this value. """
         return self.__class__(tuple(labels) + self)
 
 
+class TextEncoder(object):
+    """ Writes values as labelled JSON lines.
+
+    The values from a response usually share their labels (the URL
+    for example), so the encoded labels are remembered and only the
+    value itself is encoded for each line.  Use one encoder for the
+    values from each response.
+
+    Other output formats are in :mod:`wex.formats`.
+    """
+
+    #: Whether we write bytes rather than text
+    binary = False
+
+    #: Encodes each label and value
+    encode = staticmethod(encode_field)
+
+    end = NL
+
+    def __init__(self):
+        self.prefixes = {}
+
+    def write(self, value, write):
+        """ Calls `write` with each line of text for `value`. """
+        prefixes = self.label_prefixes(value.labels)
+        if not prefixes:
+            return
+        fields = self.fields(value.value)
+        end = self.end
+        for prefix in prefixes:
+            for field in fields:
+                write(prefix + field + end)
+
+    def flush(self, write):
+        """ Write anything held back (we hold nothing back). """
+
+    def fields(self, obj):
+        """ Returns the encoded items of the (flattened) value `obj`. """
+        encode = self.encode
+        return [encode(item) for item in flatten(obj, should_iter_unless_list)]
+
+    def prefix(self, fields):
+        """ Returns what comes before the value given encoded labels. """
+        return ''.join(field + TAB for field in fields)
+
+    def label_prefixes(self, labels):
+        """ Returns a prefix for each combination of flattened labels. """
+        # other types may flatten differently each time or be equal
+        # to each other (e.g. 1 and True) while encoding differently
+        remember = all(type(label) is text_type for label in labels)
+        if remember and labels in self.prefixes:
+            return self.prefixes[labels]
+        iterables = [map(self.encode, flatten(label)) for label in labels]
+        prefixes = [self.prefix(fields) for fields in product(*iterables)]
+        if remember:
+            self.prefixes[labels] = prefixes
+        return prefixes
+
+
 def yield_values(extract, *args, **kw):
     """ Yields ``Value`` objects extracted using ``extract``. """
     exc_info = ()
 
     try:
         returned = extract(*args, **kw)
-        for walker in walk(returned, should_iter_unless_list):
-            for value in walker:
-                yield Value(value)
+        for value in flatten(returned, should_iter_unless_list):
+            yield Value(value)
     except BdbQuit:
         raise
     except Exception as exc:
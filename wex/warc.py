@@ -0,0 +1,255 @@
+"""
+Readables for the response records in
+`WARC <https://iipc.github.io/warc-specifications/>`_ files.
+
+Both ``.warc`` and ``.warc.gz`` files are supported.  Only records
+with a ``WARC-Type`` of ``response`` are read.
+
+Each readable reads just its own record from the record's offset in
+the WARC file, so records can be extracted in parallel without the
+whole file being read (or decompressed) by every process.
+
+For ``.warc.gz`` files each record should be a separate gzip member
+(as the WARC specification recommends).  Finding the member offsets
+means decompressing the whole file once, but if there is a
+`CDX <https://iipc.github.io/warc-specifications/specifications/cdx-format/cdx-2015/>`_
+file next to the WARC file (e.g. ``crawl.warc.gz.cdx``) with the
+compressed record offset and size fields then the offsets are taken
+from that instead.
+"""
+
+from __future__ import absolute_import, unicode_literals, print_function
+import os
+import zlib
+import logging
+from io import open as io_open
+from gzip import GzipFile
+from six import BytesIO
+from .py2compat import parse_headers
+from .readable import Open, TeeReadable, partial, file_section_open
+
+
+EXT_WARC = '.warc'
+EXT_WARC_GZ = '.warc.gz'
+EXT_CDX = '.cdx'
+
+READ_SIZE = 2**16
+
+# we need this much of a decompressed record to read the WARC headers
+HEAD_SIZE = 2**14
+
+WARC_TYPE_RESPONSE = 'response'
+
+
+def is_warc_path(path):
+    lower = path.lower()
+    return lower.endswith(EXT_WARC) or lower.endswith(EXT_WARC_GZ)
+
+
+class GzipMember(GzipFile):
+    """ Readable for a gzip member that also closes its `fileobj`. """
+
+    def close(self):
+        fileobj = self.fileobj
+        GzipFile.close(self)
+        if fileobj is not None:
+            fileobj.close()
+
+
+class GzipRecord(object):
+    """ Readable for the WARC record in a gzip member.
+
+    Reading stops at the end of the record's block (as given by its
+    ``Content-Length``) so the blank lines that end the record are not
+    read as part of the response content.
+    """
+
+    def __init__(self, member):
+        self.member = member
+        # Keep the WARC headers we read so we can read them again
+        # because we can't seek back in the section of the file.
+        self.head = BytesIO()
+        tee = TeeReadable(member, self.head)
+        if tee.readline().startswith(b'WARC/'):
+            headers = parse_headers(tee)
+            content_length = int(headers.get('Content-Length', 0))
+            self.remaining = self.head.tell() + content_length
+        else:
+            self.remaining = None
+        self.head.seek(0)
+
+    @property
+    def name(self):
+        return self.member.name
+
+    def _limit(self, size):
+        if self.remaining is None:
+            if size is None:
+                return -1
+            return size
+        if size is None or size < 0 or size > self.remaining:
+            return self.remaining
+        return size
+
+    def read(self, size=-1):
+        size = self._limit(size)
+        buf = self.head.read(size)
+        if size < 0:
+            buf += self.member.read()
+        elif len(buf) < size:
+            buf += self.member.read(size - len(buf))
+        if self.remaining is not None:
+            self.remaining -= len(buf)
+        return buf
+
+    def readline(self, limit=-1):
+        limit = self._limit(limit)
+        buf = self.head.readline(limit)
+        if not buf.endswith(b'\n'):
+            if limit < 0:
+                buf += self.member.readline()
+            elif len(buf) < limit:
+                buf += self.member.readline(limit - len(buf))
+        if self.remaining is not None:
+            self.remaining -= len(buf)
+        return buf
+
+    def close(self):
+        self.member.close()
+
+
+def gzip_member_open(path, offset, size):
+    member = GzipMember(fileobj=file_section_open(path, offset, size),
+                        mode='rb')
+    return GzipRecord(member)
+
+
+def is_response_record(head):
+    """ Returns ``True`` if `head` is the start of a response record. """
+    fp = BytesIO(head)
+    if not fp.readline().startswith(b'WARC/'):
+        return False
+    headers = parse_headers(fp)
+    return headers.get('WARC-Type', '').strip().lower() == WARC_TYPE_RESPONSE
+
+
+def warc_records(fileobj):
+    """ Yield `(offset, size, head)` for each record in a WARC file. """
+    while True:
+        offset = fileobj.tell()
+        line = fileobj.readline()
+        if not line:
+            break
+        if not line.strip():
+            # records are separated by blank lines
+            continue
+        if not line.startswith(b'WARC/'):
+            logger = logging.getLogger(__name__)
+            logger.warning("expected WARC record at offset %d in %s",
+                           offset, getattr(fileobj, 'name', fileobj))
+            break
+        headers = parse_headers(fileobj)
+        content_length = int(headers.get('Content-Length', 0))
+        head_size = fileobj.tell() - offset
+        fileobj.seek(offset)
+        head = fileobj.read(head_size)
+        fileobj.seek(content_length, 1)
+        yield offset, fileobj.tell() - offset, head
+
+
+def gzip_members(fileobj):
+    """ Yield `(offset, size, head)` for each member of a gzip file.
+
+    `head` is the first :data:`HEAD_SIZE` bytes of decompressed data.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    head = b''
+    start = pos = 0
+    data = b''
+    while True:
+        if not data:
+            data = fileobj.read(READ_SIZE)
+            if not data:
+                break
+        decompressed = decompressor.decompress(data)
+        if len(head) < HEAD_SIZE:
+            head += decompressed[:HEAD_SIZE - len(head)]
+        if decompressor.unused_data:
+            # data after the end of the member is the start of the next
+            used = len(data) - len(decompressor.unused_data)
+            yield start, pos + used - start, head
+            start = pos = pos + used
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            head = b''
+        else:
+            pos += len(data)
+            data = b''
+    if pos > start:
+        yield start, pos - start, head
+
+
+def cdx_records(cdx_path, warc_path):
+    """ Returns `(offset, size)` for records of `warc_path` in a CDX file.
+
+    ``None`` is returned if the CDX file doesn't have the compressed
+    record size and offset (``S`` and ``V``) fields.
+    """
+    basename = os.path.basename(warc_path)
+    with io_open(cdx_path, 'r', encoding='utf-8') as fp:
+        fields = fp.readline().split()
+        # first line is like " CDX N b a m s k r M S V g"
+        fields = fields[1:]
+        if 'S' not in fields or 'V' not in fields:
+            return None
+        size_index = fields.index('S')
+        offset_index = fields.index('V')
+        filename_index = fields.index('g') if 'g' in fields else None
+        records = set()
+        for line in fp:
+            values = line.split()
+            if len(values) != len(fields):
+                continue
+            if (filename_index is not None and
+                    os.path.basename(values[filename_index]) != basename):
+                continue
+            records.add((int(values[offset_index]), int(values[size_index])))
+    return sorted(records)
+
+
+def gzip_member_head(path, offset, size):
+    """ Returns the first :data:`HEAD_SIZE` bytes of a gzip member. """
+    member = GzipMember(fileobj=file_section_open(path, offset, size),
+                        mode='rb')
+    try:
+        return member.read(HEAD_SIZE)
+    finally:
+        member.close()
+
+
+def readables_from_warc(path):
+    """ Yield a readable for each response record in a WARC file. """
+
+    if not path.lower().endswith(EXT_WARC_GZ):
+        with io_open(path, 'rb') as fileobj:
+            for offset, size, head in warc_records(fileobj):
+                if is_response_record(head):
+                    yield Open(partial(file_section_open, path, offset, size))
+        return
+
+    cdx_path = path + EXT_CDX
+    records = None
+    if os.path.exists(cdx_path):
+        records = cdx_records(cdx_path, path)
+    if records is not None:
+        # CDX files also list revisit records so we check the type
+        # (decompressing just the start of each member)
+        for offset, size in records:
+            if is_response_record(gzip_member_head(path, offset, size)):
+                yield Open(partial(gzip_member_open, path, offset, size))
+        return
+
+    with io_open(path, 'rb') as fileobj:
+        for offset, size, head in gzip_members(fileobj):
+            if is_response_record(head):
+                yield Open(partial(gzip_member_open, path, offset, size))